@@ -1,4 +1,17 @@
-from .content_agent import ContentAgent
-from .scheduler_agent import SchedulerAgent
+import importlib
 
-__all__ = ['ContentAgent', 'SchedulerAgent']
+# Imported on first access: ContentAgent pulls in pydantic and LangChain
+_EXPORTS = {
+    'ContentAgent': '.content_agent',
+    'SchedulerAgent': '.scheduler_agent',
+    'ContentBuffer': '.content_buffer'
+}
+
+__all__ = ['ContentAgent', 'SchedulerAgent', 'ContentBuffer']
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        module = importlib.import_module(_EXPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
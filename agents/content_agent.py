@@ -1,9 +1,18 @@
 """
 Content Generation Agent - Uses LangChain to generate platform-specific posts
 """
-import os
-from typing import Dict, List
-from pydantic import BaseModel, Field
+import re
+import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from pydantic import BaseModel, Field, ValidationError
+from tools import platforms
+from tools.content_adapter import URL_LENGTHS, adapt_all, adapt_text, split_thread
+from tools.metrics import LLM_CALLS, LLM_LATENCY, LLM_TOKENS
+from tools.tracing import span
 
 
 class GeneratedPost(BaseModel):
@@ -14,60 +23,171 @@ class GeneratedPost(BaseModel):
     engagement_hooks: List[str] = Field(description="Call-to-action suggestions")
 
 
+_DECODER = json.JSONDecoder()
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+
+def _loads_object(candidate: str) -> Optional[Dict]:
+    for text in (candidate, _TRAILING_COMMA.sub(r'\1', candidate)):
+        try:
+            obj = json.loads(text)
+        except ValueError:
+            continue
+        return obj if isinstance(obj, dict) else None
+    return None
+
+
+def extract_json(text: str) -> Optional[Dict]:
+    """
+    Pull the first JSON object out of model output.
+    Tolerates surrounding prose, trailing commas and output cut off mid-stream
+    (open strings, arrays and objects are closed, a dangling member is dropped).
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+    try:
+        obj, _ = _DECODER.raw_decode(text, start)
+        return obj if isinstance(obj, dict) else None
+    except ValueError:
+        pass
+    
+    body = text[start:]
+    stack = []
+    cuts = []
+    in_str = escaped = False
+    for i, ch in enumerate(body):
+        if in_str:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]':
+            if stack:
+                stack.pop()
+            if not stack:
+                return _loads_object(body[:i + 1])
+        elif ch == ',':
+            cuts.append((i, ''.join(reversed(stack))))
+    
+    # Truncated: close what is open, then fall back to the last complete member
+    tail = body[:-1] if escaped else body
+    if in_str:
+        tail += '"'
+    tail = tail.rstrip()
+    if tail.endswith(':'):
+        tail += 'null'
+    obj = _loads_object(tail.rstrip(',') + ''.join(reversed(stack)))
+    if obj is not None:
+        return obj
+    for pos, closers in reversed(cuts):
+        obj = _loads_object(body[:pos] + closers)
+        if obj is not None:
+            return obj
+    return None
+
+
+class PartialJSONField:
+    """Incrementally decodes one string field from a streaming JSON object"""
+    
+    ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+    
+    def __init__(self, key: str):
+        self.key_pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(key))
+        self.buffer = ''
+        self.value = ''
+        self.done = False
+        self._pos = None
+    
+    def feed(self, chunk: str) -> str:
+        """Add a chunk of raw model output and return newly decoded text"""
+        self.buffer += chunk
+        if self.done:
+            return ''
+        
+        if self._pos is None:
+            match = self.key_pattern.search(self.buffer)
+            if not match:
+                return ''
+            self._pos = match.end()
+        
+        decoded = []
+        buf, pos = self.buffer, self._pos
+        while pos < len(buf):
+            ch = buf[pos]
+            if ch == '"':
+                self.done = True
+                pos += 1
+                break
+            if ch != '\\':
+                decoded.append(ch)
+                pos += 1
+                continue
+            
+            # Escape sequence - wait for more input if it is cut off
+            if pos + 1 >= len(buf):
+                break
+            esc = buf[pos + 1]
+            if esc != 'u':
+                decoded.append(self.ESCAPES.get(esc, esc))
+                pos += 2
+                continue
+            if pos + 6 > len(buf):
+                break
+            code = int(buf[pos + 2:pos + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                # High surrogate: needs the low half before it can be emitted
+                if pos + 12 > len(buf):
+                    break
+                low = int(buf[pos + 8:pos + 12], 16)
+                code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                pos += 6
+            decoded.append(chr(code))
+            pos += 6
+        
+        self._pos = pos
+        delta = ''.join(decoded)
+        self.value += delta
+        return delta
+
+
 class ContentAgent:
     """Agent responsible for generating marketing content across platforms"""
     
-    PLATFORM_CONFIGS = {
-        'x': {
-            'max_chars': 280,
-            'style': 'concise, punchy, thread-friendly',
-            'tone': 'casual, witty, conversational'
-        },
-        'linkedin': {
-            'max_chars': 3000,
-            'style': 'professional, thought-leadership, storytelling',
-            'tone': 'professional, insightful, value-driven'
-        },
-        'reddit': {
-            'max_chars': 40000,
-            'style': 'authentic, community-focused, non-promotional',
-            'tone': 'genuine, helpful, NOT salesy'
-        },
-        'meta': {
-            'max_chars': 2200,
-            'style': 'visual-first, engaging, shareable',
-            'tone': 'friendly, relatable'
-        },
-        'instagram': {
-            'max_chars': 2200,
-            'style': 'visual-first, aesthetic, hashtag-rich',
-            'tone': 'aspirational, authentic'
-        },
-        'tiktok': {
-            'max_chars': 2200,
-            'style': 'trend-aware, hook-driven, entertaining',
-            'tone': 'casual, fun, gen-z friendly'
-        },
-        'youtube': {
-            'max_chars': 5000,
-            'style': 'SEO-optimized, descriptive',
-            'tone': 'informative, engaging'
-        },
-        'threads': {
-            'max_chars': 500,
-            'style': 'conversational, authentic',
-            'tone': 'casual, genuine'
-        },
-        'pinterest': {
-            'max_chars': 500,
-            'style': 'descriptive, keyword-rich',
-            'tone': 'inspiring, actionable'
-        }
-    }
+    # Same for every request; per-platform and per-product details go in the brief
+    SYSTEM_PROMPT = """You are Marketing Mandy, an expert social media marketer.
+You write one post for the platform, product and audience you are given,
+respecting the platform's character limit, style and tone.
+
+Return ONLY a JSON object with these keys:
+- content: the post text
+- hashtags: array of hashtags (without #)
+- media_suggestions: array of image/video ideas
+- engagement_hooks: array of CTA ideas
+
+Make it authentic, not salesy AI slop."""
+    
+    # Output budget: post text at ~3 chars/token plus the JSON envelope
+    CHARS_PER_TOKEN = 3
+    JSON_OVERHEAD_TOKENS = 150
+    MAX_OUTPUT_TOKENS = 2000
     
     def __init__(self, model_provider: str = "anthropic"):
         self.model_provider = model_provider
         self.llm = None
+        self.structured_llm = None
+        self.usage = {'calls': 0, 'input_tokens': 0, 'output_tokens': 0, 'cache_read_tokens': 0, 'latency_ms': 0.0}
+        self.parse_stats = {'responses': 0, 'parsed': 0, 'repaired': 0, 'failed': 0, 'repair_calls': 0}
+        self.recent_calls = deque(maxlen=200)
+        self._usage_lock = threading.Lock()
+        self._system_message = {'role': 'system', 'content': self.SYSTEM_PROMPT}
         self._init_model()
     
     def _init_model(self):
@@ -78,18 +198,26 @@ class ContentAgent:
                 self.llm = ChatAnthropic(
                     model="claude-sonnet-4-20250514",
                     temperature=0.8,
-                    max_tokens=2000
+                    max_tokens=self.MAX_OUTPUT_TOKENS
                 )
             else:
                 from langchain_openai import ChatOpenAI
                 self.llm = ChatOpenAI(
                     model="gpt-4-turbo-preview",
                     temperature=0.8,
-                    max_tokens=2000
+                    max_tokens=self.MAX_OUTPUT_TOKENS
                 )
         except Exception as e:
             print(f"Warning: Could not initialize LLM: {e}")
             self.llm = None
+            return
+        
+        try:
+            # Structured-output mode: the model must answer with GeneratedPost tool arguments
+            self.structured_llm = self.llm.bind_tools([GeneratedPost], tool_choice='GeneratedPost')
+        except Exception as e:
+            print(f"Warning: Structured output unavailable, using JSON prompting: {e}")
+            self.structured_llm = None
     
     def generate_post(
         self,
@@ -101,51 +229,255 @@ class ContentAgent:
     ) -> Dict:
         """Generate a marketing post for a specific platform"""
         
-        config = self.PLATFORM_CONFIGS.get(platform, self.PLATFORM_CONFIGS['x'])
+        with span('ContentAgent.generate_post', platform=platform, llm=bool(self.llm)):
+            if not self.llm:
+                # Fallback mock response
+                return self.mock_post(product_name, product_description)
+            
+            prompt = self._build_prompt(platform, product_name, product_description, target_audience, style)
+            
+            post = None
+            try:
+                response = self._invoke(platform, prompt)
+                with span('ContentAgent.parse_post', platform=platform):
+                    post = self._parse_post(self._response_payload(response), platform, prompt)
+            except Exception as e:
+                print(f"Generation error: {e}")
+            
+            # Fallback
+            return post or self._fallback_post(product_name, product_description)
+    
+    def generate_campaign(
+        self,
+        platforms: List[str],
+        product_name: str,
+        product_description: str,
+        target_audience: str = "",
+        style: str = "professional"
+    ) -> Dict[str, Dict]:
+        """Generate posts for several platforms in one concurrent batch"""
         
         if not self.llm:
-            # Fallback mock response
-            return {
-                'content': f"Check out {product_name}! {product_description[:100]}...",
-                'hashtags': ['marketing', product_name.lower().replace(' ', '')],
-                'media_suggestions': ['Product photo', 'Logo'],
-                'engagement_hooks': ['Learn more!', 'Link in bio']
-            }
+            return {p: self.mock_post(product_name, product_description) for p in platforms}
         
-        prompt = f"""You are Marketing Mandy, an expert social media marketer.
-Create a {platform} post for:
-
+        prompts = [
+            self._build_prompt(p, product_name, product_description, target_audience, style)
+            for p in platforms
+        ]
+        
+        def run(platform, prompt):
+            try:
+                return self._invoke(platform, prompt)
+            except Exception as e:
+                return e
+        
+        # Requests run concurrently (each with its own output budget), so a
+        # full campaign costs roughly one round trip instead of one per platform
+        with ThreadPoolExecutor(max_workers=len(platforms) or 1) as pool:
+            responses = list(pool.map(run, platforms, prompts))
+        
+        posts = {}
+        for platform, prompt, response in zip(platforms, prompts, responses):
+            post = None
+            if isinstance(response, Exception):
+                print(f"Generation error ({platform}): {response}")
+            else:
+                try:
+                    post = self._parse_post(self._response_payload(response), platform, prompt)
+                except Exception as e:
+                    print(f"Generation error ({platform}): {e}")
+            posts[platform] = post or self._fallback_post(product_name, product_description)
+        return posts
+    
+    def stream_post(
+        self,
+        platform: str,
+        product_name: str,
+        product_description: str,
+        target_audience: str = "",
+        style: str = "professional"
+    ) -> Iterator[Tuple[str, Dict]]:
+        """Stream a post as ('delta', {'text': ...}) events, then ('done', post)"""
+        
+        if not self.llm:
+            post = self.mock_post(product_name, product_description)
+            yield 'delta', {'text': post['content']}
+            yield 'done', post
+            return
+        
+        prompt = self._build_prompt(platform, product_name, product_description, target_audience, style)
+        field = PartialJSONField('content')
+        post = None
+        
+        started = time.perf_counter()
+        usage = {'input_tokens': 0, 'output_tokens': 0, 'input_token_details': {}}
+        
+        try:
+            for chunk in self.llm.stream(prompt, max_tokens=self._max_tokens(platform)):
+                if chunk.usage_metadata:
+                    usage['input_tokens'] += chunk.usage_metadata.get('input_tokens', 0)
+                    usage['output_tokens'] += chunk.usage_metadata.get('output_tokens', 0)
+                    usage['input_token_details'].update(chunk.usage_metadata.get('input_token_details') or {})
+                delta = field.feed(chunk.content)
+                if delta:
+                    yield 'delta', {'text': delta}
+            self._record_usage(platform, usage, started)
+            post = self._parse_post(field.buffer, platform, prompt)
+        except Exception as e:
+            print(f"Generation error: {e}")
+        
+        yield 'done', post or self._fallback_post(product_name, product_description)
+    
+    def _build_prompt(
+        self,
+        platform: str,
+        product_name: str,
+        product_description: str,
+        target_audience: str,
+        style: str
+    ) -> List[Dict]:
+        """Shared system prompt plus the small per-request brief"""
+        config = platforms.get(platform) or platforms.get('x')
+        
+        brief = f"""Platform: {platform} (max {config['max_chars']} characters; style: {config['style']}; tone: {config['tone']})
 Product: {product_name}
 Description: {product_description}
 Audience: {target_audience or 'general'}
-Style: {style}
-
-Platform requirements:
-- Max {config['max_chars']} characters
-- Style: {config['style']}
-- Tone: {config['tone']}
-
-Return ONLY a JSON object with these keys:
-- content: the post text
-- hashtags: array of hashtags (without #)
-- media_suggestions: array of image/video ideas
-- engagement_hooks: array of CTA ideas
-
-Make it authentic, not salesy AI slop."""
-
+Style: {style}"""
+        return [self._system_message, {'role': 'user', 'content': brief}]
+    
+    def _max_tokens(self, platform: str) -> int:
+        """Output token budget sized to the platform's character limit"""
+        config = platforms.get(platform) or platforms.get('x')
+        budget = config['max_chars'] // self.CHARS_PER_TOKEN + self.JSON_OVERHEAD_TOKENS
+        return min(budget, self.MAX_OUTPUT_TOKENS)
+    
+    def _invoke(self, platform: str, prompt: List[Dict], max_tokens: Optional[int] = None, structured: bool = True):
+        started = time.perf_counter()
+        llm = self.structured_llm if structured and self.structured_llm else self.llm
+        with span('llm.invoke', platform=platform, structured=structured):
+            response = llm.invoke(prompt, max_tokens=max_tokens or self._max_tokens(platform))
+        self._record_usage(platform, response.usage_metadata, started)
+        return response
+    
+    def _record_usage(self, platform: str, usage: Optional[Dict], started: float):
+        usage = usage or {}
+        elapsed = time.perf_counter() - started
+        record = {
+            'platform': platform,
+            'input_tokens': usage.get('input_tokens', 0),
+            'output_tokens': usage.get('output_tokens', 0),
+            'cache_read_tokens': (usage.get('input_token_details') or {}).get('cache_read', 0) or 0,
+            'latency_ms': round(elapsed * 1000, 1)
+        }
+        LLM_LATENCY.observe(elapsed, platform)
+        LLM_CALLS.inc('hit' if record['cache_read_tokens'] else 'miss')
+        for kind in ('input', 'output', 'cache_read'):
+            LLM_TOKENS.inc(kind, amount=record[f'{kind}_tokens'])
+        with self._usage_lock:
+            self.usage['calls'] += 1
+            for key in ('input_tokens', 'output_tokens', 'cache_read_tokens', 'latency_ms'):
+                self.usage[key] += record[key]
+            self.recent_calls.append(record)
+    
+    def get_usage(self) -> Dict:
+        """Token and latency totals, plus the most recent calls"""
+        with self._usage_lock:
+            stats = dict(self.parse_stats)
+            usage = {**self.usage, 'parse': stats, 'recent': list(self.recent_calls)}
+        stats['success_rate'] = (stats['parsed'] + stats['repaired']) / stats['responses'] if stats['responses'] else None
+        return usage
+    
+    def _count(self, key: str):
+        with self._usage_lock:
+            self.parse_stats[key] += 1
+    
+    @staticmethod
+    def _response_payload(response):
+        """Tool-call arguments in structured mode, otherwise the raw text"""
+        if getattr(response, 'tool_calls', None):
+            return response.tool_calls[0]['args']
+        if getattr(response, 'invalid_tool_calls', None):
+            return response.invalid_tool_calls[0].get('args') or ''
+        content = response.content
+        if isinstance(content, list):
+            content = ''.join(block.get('text', '') if isinstance(block, dict) else str(block) for block in content)
+        return content
+    
+    @staticmethod
+    def _coerce_fields(data: Dict) -> Dict:
+        """Cheap local fixes for common near-misses before spending a repair call"""
+        data = dict(data)
+        for key in ('hashtags', 'media_suggestions', 'engagement_hooks'):
+            value = data.get(key)
+            if isinstance(value, str):
+                data[key] = [v.strip() for v in re.split(r'[,\n]', value) if v.strip()]
+        if isinstance(data.get('hashtags'), list):
+            data['hashtags'] = [str(tag).lstrip('#') for tag in data['hashtags']]
+        if isinstance(data.get('content'), list):
+            data['content'] = '\n'.join(str(part) for part in data['content'])
+        return data
+    
+    @staticmethod
+    def _failing_fields(data: Dict) -> set:
         try:
-            response = self.llm.invoke(prompt)
-            import json
-            # Try to parse JSON from response
-            text = response.content
-            start = text.find('{')
-            end = text.rfind('}') + 1
-            if start != -1 and end > start:
-                return json.loads(text[start:end])
-        except Exception as e:
-            print(f"Generation error: {e}")
+            GeneratedPost.model_validate(data)
+        except ValidationError as e:
+            return {str(err['loc'][0]) for err in e.errors() if err['loc']}
+        return set()
+    
+    def _parse_post(self, payload, platform: str, prompt: List[Dict]) -> Optional[Dict]:
+        """Validate a response against GeneratedPost, repairing only the fields that fail"""
+        self._count('responses')
+        data = payload if isinstance(payload, dict) else (extract_json(payload) or {})
+        data = self._coerce_fields(data)
+        
+        failing = self._failing_fields(data)
+        if failing:
+            self._count('repair_calls')
+            try:
+                data.update(self._coerce_fields(self._repair_fields(platform, prompt, data, failing)))
+            except Exception as e:
+                print(f"Repair error ({platform}): {e}")
+            if self._failing_fields(data):
+                self._count('failed')
+                print(f"Invalid post for {platform}: could not repair {sorted(failing)}")
+                return None
+            self._count('repaired')
+        else:
+            self._count('parsed')
         
-        # Fallback
+        post = GeneratedPost.model_validate(data)
+        post.content = self.adapt_content(post.content, platform, platform)
+        return post.model_dump()
+    
+    def _repair_fields(self, platform: str, prompt: List[Dict], data: Dict, fields: set) -> Dict:
+        """Ask for just the missing or invalid fields, with a matching small output budget"""
+        schema = GeneratedPost.model_json_schema()['properties']
+        wanted = '\n'.join(f"- {name}: {schema[name].get('description', '')}" for name in sorted(fields) if name in schema)
+        keep = {k: v for k, v in data.items() if k in schema and k not in fields}
+        request = f"""Your previous answer had missing or invalid values for these keys:
+{wanted}
+
+Already accepted: {json.dumps(keep)}
+
+Return ONLY a JSON object containing just those keys."""
+        max_tokens = self._max_tokens(platform) if 'content' in fields else 200
+        response = self._invoke(platform, prompt + [{'role': 'user', 'content': request}], max_tokens=max_tokens, structured=False)
+        return extract_json(self._response_payload(response)) or {}
+    
+    @staticmethod
+    def mock_post(product_name: str, product_description: str) -> Dict:
+        """Offline stand-in used when no LLM is configured"""
+        return {
+            'content': f"Check out {product_name}! {product_description[:100]}...",
+            'hashtags': ['marketing', product_name.lower().replace(' ', '')],
+            'media_suggestions': ['Product photo', 'Logo'],
+            'engagement_hooks': ['Learn more!', 'Link in bio']
+        }
+    
+    def _fallback_post(self, product_name: str, product_description: str) -> Dict:
+        """Generic post returned when generation fails"""
         return {
             'content': f"Check out {product_name}! {product_description[:100]}",
             'hashtags': ['marketing'],
@@ -155,9 +487,15 @@ Make it authentic, not salesy AI slop."""
     
     def adapt_content(self, original: str, source: str, target: str) -> str:
         """Adapt content from one platform to another"""
-        target_config = self.PLATFORM_CONFIGS.get(target, {})
-        max_chars = target_config.get('max_chars', 280)
-        
-        if len(original) <= max_chars:
-            return original
-        return original[:max_chars-3] + "..."
+        max_chars = platforms.max_chars(target)
+        return adapt_text(original, max_chars, URL_LENGTHS.get(target))
+    
+    def adapt_thread(self, original: str, target: str) -> List[str]:
+        """Split long content into a numbered thread for the target platform"""
+        max_chars = platforms.max_chars(target)
+        return split_thread(original, max_chars, URL_LENGTHS.get(target))
+    
+    def adapt_campaign(self, original: str, targets: List[str]) -> Dict[str, str]:
+        """Re-flow one master post into every target platform without an LLM call"""
+        limits = {t: platforms.max_chars(t) for t in targets}
+        return adapt_all(original, limits)
@@ -0,0 +1,165 @@
+"""
+Content Buffer - Pre-generates upcoming posts so scheduled jobs never wait on the LLM
+"""
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional, Set
+import logging
+from tools.workspaces import DEFAULT_WORKSPACE, scoped
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ContentBuffer:
+    """Rolling buffer of ready-to-post content per campaign and platform"""
+
+    SCHEMA = '''CREATE TABLE IF NOT EXISTS mandy_post_buffer (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        campaign_id TEXT NOT NULL,
+        platform TEXT NOT NULL,
+        post TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )'''
+    INDEX = '''CREATE INDEX IF NOT EXISTS ix_mandy_post_buffer_slot
+        ON mandy_post_buffer (campaign_id, platform, id)'''
+
+    def __init__(
+        self,
+        db_path: str,
+        agent_factory: Callable,
+        days: int = 3,
+        max_workers: int = 2,
+        dedup_index=None,
+        max_attempts: int = 3
+    ):
+        self.db_path = db_path
+        self.agent_factory = agent_factory
+        self.days = days
+        self.dedup_index = dedup_index
+        self.max_attempts = max_attempts
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mandy-pregen')
+        self._pending = {}
+        # Campaigns discarded while generations for them were still queued or running
+        self._cancelled = set()
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute(self.SCHEMA)
+            conn.execute(self.INDEX)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def ready_count(self, campaign_id: str, platform: str) -> int:
+        """Number of posts waiting in the buffer"""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT COUNT(*) FROM mandy_post_buffer WHERE campaign_id = ? AND platform = ?',
+                (campaign_id, platform)
+            ).fetchone()
+        return row[0]
+
+    def depth(self) -> Dict[str, int]:
+        """Posts ready across all campaigns, and generations still queued or running"""
+        with self._connect() as conn:
+            ready = conn.execute('SELECT COUNT(*) FROM mandy_post_buffer').fetchone()[0]
+        with self._lock:
+            pending = sum(self._pending.values())
+        return {'ready': ready, 'pending': pending}
+
+    def fill(self, campaign_id: str, product: Dict, posts_per_day: Dict[str, int], workspace_id: str = DEFAULT_WORKSPACE):
+        """Queue background generation until each platform holds `days` worth of posts"""
+        for platform, per_day in posts_per_day.items():
+            target = self.days * per_day
+            key = (campaign_id, platform)
+            # Counted outside the lock so callers never queue behind SQLite; a generation
+            # finishing in between can overshoot the target by the posts it wrote
+            ready = self.ready_count(campaign_id, platform)
+
+            with self._lock:
+                self._cancelled.discard(campaign_id)
+                deficit = target - ready - self._pending.get(key, 0)
+                if deficit <= 0:
+                    continue
+                self._pending[key] = self._pending.get(key, 0) + deficit
+
+            for _ in range(deficit):
+                self.executor.submit(self._generate, campaign_id, platform, product, workspace_id)
+
+    def _generate(self, campaign_id: str, platform: str, product: Dict, workspace_id: str = DEFAULT_WORKSPACE):
+        key = (campaign_id, platform)
+        # Same key execute_post checks, so workspaces never suppress each other's posts
+        dedup_key = scoped(workspace_id, platform)
+        try:
+            if campaign_id in self._cancelled:
+                return
+            for _ in range(self.max_attempts):
+                post = self.agent_factory().generate_post(
+                    platform=platform,
+                    product_name=product.get('name', ''),
+                    product_description=product.get('description') or product.get('vibe', ''),
+                    style=product.get('vibe') or 'professional'
+                )
+                if not self.dedup_index or not self.dedup_index.is_duplicate(dedup_key, post['content']):
+                    break
+            else:
+                logger.warning(f"Dropped near-duplicate post for {campaign_id}/{platform}")
+                return
+
+            if self.dedup_index:
+                self.dedup_index.add(dedup_key, post['content'])
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    'INSERT INTO mandy_post_buffer (campaign_id, platform, post, created_at) VALUES (?, ?, ?, ?)',
+                    (campaign_id, platform, json.dumps(post), datetime.now().isoformat())
+                )
+                if campaign_id in self._cancelled:
+                    # Discarded while this post was being generated
+                    conn.execute('DELETE FROM mandy_post_buffer WHERE id = ?', (cursor.lastrowid,))
+        except Exception as e:
+            logger.error(f"Pre-generation failed for {campaign_id}/{platform}: {e}")
+        finally:
+            with self._lock:
+                self._pending[key] -= 1
+                if not self._pending[key]:
+                    del self._pending[key]
+                    if not any(pending[0] == campaign_id for pending in self._pending):
+                        self._cancelled.discard(campaign_id)
+
+    def pop(self, campaign_id: str, platform: str) -> Optional[Dict]:
+        """Take the oldest ready post, or None if the buffer is empty"""
+        conn = self._connect()
+        conn.isolation_level = None
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT id, post FROM mandy_post_buffer WHERE campaign_id = ? AND platform = ? ORDER BY id LIMIT 1',
+                (campaign_id, platform)
+            ).fetchone()
+            if row:
+                conn.execute('DELETE FROM mandy_post_buffer WHERE id = ?', (row[0],))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        return json.loads(row[1]) if row else None
+
+    def campaign_ids(self) -> Set[str]:
+        """Campaigns with posts waiting in the buffer"""
+        with self._connect() as conn:
+            return {row[0] for row in conn.execute('SELECT DISTINCT campaign_id FROM mandy_post_buffer')}
+
+    def discard(self, campaign_id: str):
+        """Drop everything buffered for a campaign, including generations still in flight"""
+        with self._lock:
+            if any(key[0] == campaign_id for key in self._pending):
+                self._cancelled.add(campaign_id)
+        with self._connect() as conn:
+            conn.execute('DELETE FROM mandy_post_buffer WHERE campaign_id = ?', (campaign_id,))
+
+    def shutdown(self, wait: bool = True):
+        """Stop workers; queued generations are dropped and refilled on the next run"""
+        self.executor.shutdown(wait=wait, cancel_futures=True)
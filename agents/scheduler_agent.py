@@ -4,6 +4,7 @@ Scheduler Agent - Manages post scheduling and execution
 from datetime import datetime, timedelta
 from typing import Dict, List
 import logging
+from tools import platforms
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,27 +13,17 @@ logger = logging.getLogger(__name__)
 class SchedulerAgent:
     """Agent responsible for scheduling and executing posts"""
     
-    # Optimal posting times by platform (24h format)
-    DEFAULT_SCHEDULES = {
-        'instagram': {'times': ['11:00', '21:00'], 'days': 'daily'},
-        'x': {'times': ['09:00', '12:00', '17:00'], 'days': 'daily'},
-        'linkedin': {'times': ['07:30', '12:00'], 'days': 'weekdays'},
-        'meta': {'times': ['09:00', '13:00', '19:00'], 'days': 'daily'},
-        'tiktok': {'times': ['12:00', '19:00', '22:00'], 'days': 'daily'},
-        'reddit': {'times': ['10:00', '19:00'], 'days': 'daily'},
-        'youtube': {'times': ['15:00'], 'days': 'daily'},
-        'threads': {'times': ['09:00', '18:00'], 'days': 'daily'},
-        'pinterest': {'times': ['14:00', '21:00'], 'days': 'daily'}
-    }
-    
-    def __init__(self, scheduler, platform_manager):
+    def __init__(self, scheduler, platform_manager, credential_store=None, engagement=None):
         self.scheduler = scheduler
         self.platform_manager = platform_manager
+        self.credential_store = credential_store
+        # EngagementStore with learned posting slots; the registry's schedules until it has data
+        self.engagement = engagement
         self.job_registry = {}
     
     def get_default_schedule(self, platform: str) -> Dict:
         """Get default schedule for a platform"""
-        return self.DEFAULT_SCHEDULES.get(platform, {'times': ['12:00'], 'days': 'daily'})
+        return platforms.schedule(platform)
     
     def schedule_campaign(
         self,
@@ -92,21 +83,27 @@ class SchedulerAgent:
         
         for post in posts:
             platform = post['platform']
-            schedule = self.DEFAULT_SCHEDULES.get(platform, {'times': ['12:00']})
+            schedule = platforms.schedule(platform)
+            account = self._account_for(platform) if self.engagement else ''
+            learned = self.engagement.next_best_time(platform, account, now) if account else None
             
-            # Find next available time slot
-            for time_str in schedule['times']:
-                hour, minute = map(int, time_str.split(':'))
-                scheduled_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                
-                if scheduled_time > now:
-                    break
+            if learned:
+                # Soonest of this account's best-performing hour-of-week slots
+                scheduled_time = learned
             else:
-                # All times passed today, schedule for tomorrow
-                hour, minute = map(int, schedule['times'][0].split(':'))
-                scheduled_time = (now + timedelta(days=1)).replace(
-                    hour=hour, minute=minute, second=0, microsecond=0
-                )
+                # Find next available time slot
+                for time_str in schedule['times']:
+                    hour, minute = map(int, time_str.split(':'))
+                    scheduled_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+                    
+                    if scheduled_time > now:
+                        break
+                else:
+                    # All times passed today, schedule for tomorrow
+                    hour, minute = map(int, schedule['times'][0].split(':'))
+                    scheduled_time = (now + timedelta(days=1)).replace(
+                        hour=hour, minute=minute, second=0, microsecond=0
+                    )
             
             job = self.scheduler.add_job(
                 self._execute_post,
@@ -183,6 +180,10 @@ class SchedulerAgent:
         
         return jobs
     
+    def _account_for(self, platform: str) -> str:
+        credentials = self.credential_store.get(platform) if self.credential_store else None
+        return self.platform_manager.account_key(platform, credentials or None)
+    
     def _execute_post(self, campaign_id: str, post: Dict):
         """Execute a scheduled post"""
         logger.info(f"Executing post for campaign {campaign_id} to {post['platform']}")
@@ -191,9 +192,12 @@ class SchedulerAgent:
             result = self.platform_manager.post(
                 platform=post['platform'],
                 content=post['content'],
+                credentials=self.credential_store.get(post['platform']) if self.credential_store else None,
                 hashtags=post.get('hashtags', [])
             )
             logger.info(f"Posted to {post['platform']}: {result}")
+            if self.engagement and result.get('success') and result.get('post_id'):
+                self.engagement.record_post(post['platform'], result.get('account', ''), result['post_id'])
             return result
         except Exception as e:
             logger.error(f"Failed to post to {post['platform']}: {e}")
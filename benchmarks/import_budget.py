@@ -0,0 +1,67 @@
+"""
+Import-time budget check - fails when cold-importing a module gets too slow
+Usage: python benchmarks/import_budget.py [--budget-ms 250] [--runs 5] [module ...]
+
+Each run uses a fresh interpreter with `python -X importtime`; the best of
+`runs` cumulative times is compared against the budget.
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_MODULES = ['mandy', 'agents', 'tools']
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds for every module loaded"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}' if module else 'pass'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line.split(':', 1)[1].split('|'))
+        times[name] = max(times.get(name, 0), int(cumulative))
+    return times
+
+
+def measure(module: str, runs: int) -> Tuple[float, List[Tuple[str, int]]]:
+    # Modules loaded by interpreter startup are not the target's fault
+    startup = set(import_times(''))
+    best = None
+    for _ in range(runs):
+        times = import_times(module)
+        if best is None or times[module] < best[module]:
+            best = times
+    heaviest = sorted(
+        ((name, us) for name, us in best.items() if '.' not in name and name != module and name not in startup),
+        key=lambda item: item[1], reverse=True
+    )[:8]
+    return best[module] / 1000, heaviest
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--budget-ms', type=float, default=250.0)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        ms, heaviest = measure(module, args.runs)
+        status = 'ok' if ms <= args.budget_ms else 'OVER BUDGET'
+        failed |= ms > args.budget_ms
+        print(f"{module}: {ms:.1f} ms (budget {args.budget_ms:.0f} ms) {status}")
+        for name, us in heaviest:
+            print(f"    {name:<24} {us / 1000:8.1f} ms")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Load test for the campaign API under the production server
+Usage: python benchmarks/load_test.py [--url http://host:port] [--concurrency 16] [--duration 10]
+
+Without --url the app is started in-process under waitress (as `mandy.py --serve`
+would) in a scratch directory, with no LLM or platform credentials configured.
+"""
+import argparse
+import base64
+import http.client
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+PLATFORM_IDS = ['bluesky', 'mastodon', 'reddit', 'instagram', 'linkedin', 'facebook', 'tiktok', 'youtube', 'threads']
+
+
+def start_local_server(threads: int) -> str:
+    """Serve create_app() on a free port from a scratch directory"""
+    sys.path.insert(0, str(ROOT))
+    os.chdir(tempfile.mkdtemp(prefix='mandy-load-'))
+    import mandy
+    from waitress.server import create_server
+
+    app = mandy.create_app()
+    for name in ('apscheduler', 'agents', 'waitress'):
+        logging.getLogger(name).setLevel(logging.ERROR)
+    server = create_server(app, host='127.0.0.1', port=0, threads=threads, connection_limit=1000)
+    threading.Thread(target=server.run, daemon=True).start()
+    return f'http://127.0.0.1:{server.effective_port}'
+
+
+def run_phase(url: str, duration: float, concurrency: int, make_request) -> Dict:
+    """Drive make_request(conn) from `concurrency` threads for `duration` seconds"""
+    parsed = urlparse(url)
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if make_request(conn) >= 400:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(pct(0.50), 2),
+        'p95_ms': round(pct(0.95), 2),
+        'p99_ms': round(pct(0.99), 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else 0
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='Existing server to target instead of an in-process one')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per endpoint')
+    parser.add_argument('--threads', type=int, default=8, help='Server threads for the in-process server')
+    parser.add_argument('--platforms', type=int, default=3, help='Platforms per launched campaign')
+    parser.add_argument('--asset-kb', type=int, default=0, help='Size of one inline asset per launch')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    url = args.url or start_local_server(args.threads)
+    asset = []
+    if args.asset_kb:
+        data = base64.b64encode(os.urandom(args.asset_kb * 768)).decode()
+        asset = [{'id': 1, 'name': 'photo.jpg', 'data': f'data:image/jpeg;base64,{data}'}]
+    launch_body = json.dumps({
+        'product': {'name': 'Load Test Mug', 'vibe': 'Fun & quirky'},
+        'assets': asset,
+        'platforms': PLATFORM_IDS[:args.platforms]
+    })
+    campaign_ids = []
+    ids_lock = threading.Lock()
+
+    def launch(conn):
+        conn.request('POST', '/api/launch', body=launch_body, headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        body = response.read()
+        if response.status == 200:
+            with ids_lock:
+                campaign_ids.append(json.loads(body)['campaign_id'])
+        return response.status
+
+    def read_campaign(conn):
+        conn.request('GET', f'/api/campaign/{random.choice(campaign_ids)}')
+        response = conn.getresponse()
+        response.read()
+        return response.status
+
+    results = {'url': url, 'concurrency': args.concurrency, 'platforms': args.platforms, 'asset_kb': args.asset_kb}
+    results['launch'] = run_phase(url, args.duration, args.concurrency, launch)
+    if campaign_ids:
+        results['campaign'] = run_phase(url, args.duration, args.concurrency, read_campaign)
+
+    for name in ('launch', 'campaign'):
+        if name in results:
+            r = results[name]
+            print(f"{name:<9} {r['rps']:>8} req/s  p50 {r['p50_ms']:>7} ms  p95 {r['p95_ms']:>7} ms  "
+                  f"p99 {r['p99_ms']:>7} ms  errors {r['errors']}/{r['requests']}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,402 @@
+"""
+Offline benchmark suite for the hot paths - JSON results for comparing commits
+Usage: python benchmarks/suite.py [--quick] [--only launch,pause,...] [--json out.json] [--compare base.json]
+
+Everything runs locally: a scratch directory for SQLite and uploads, a stub
+LLM for ContentAgent and a stand-in Bluesky/Mastodon server for PlatformManager.
+A local receiver stands in for webhook endpoints.
+Sections: launch, pause, jobstore, platform_post, generate_post, adapt, webhooks.
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+SECTIONS = ['launch', 'pause', 'jobstore', 'platform_post', 'generate_post', 'adapt', 'webhooks']
+PLATFORM_IDS = ['bluesky', 'mastodon', 'reddit', 'instagram', 'linkedin', 'facebook', 'tiktok', 'youtube', 'threads']
+
+
+def stats(samples: List[float]) -> Dict:
+    """Latency summary in milliseconds from samples in seconds"""
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'min_ms': round(ordered[0] * 1000, 3)
+    }
+
+
+def timed(fn: Callable[[], object], runs: int) -> Dict:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return stats(samples)
+
+
+def data_url(kb: int) -> str:
+    return 'data:image/jpeg;base64,' + base64.b64encode(os.urandom(kb * 1024)).decode()
+
+
+# Jobs fired by the jobstore benchmark; module-level so the jobstore can reference them
+_fired = {'count': 0, 'target': 0, 'done': threading.Event()}
+_fired_lock = threading.Lock()
+
+
+def _count_fire():
+    with _fired_lock:
+        _fired['count'] += 1
+        if _fired['count'] >= _fired['target']:
+            _fired['done'].set()
+
+
+def _noop():
+    pass
+
+
+def bench_launch(client, quick: bool) -> Dict:
+    """POST /api/launch latency by platform count and asset size, inline vs uploaded beforehand"""
+    results = {}
+    runs = 5 if quick else 20
+    for kb in ((256,) if quick else (256, 2048)):
+        blob = os.urandom(kb * 1024)
+        results[f'upload.asset_{kb}kb'] = timed(
+            lambda: client.post('/api/assets?name=photo.jpg', data=blob, content_type='image/jpeg'), runs
+        )
+    for count in (1, 3, 9):
+        for kb in ((0, 256) if quick else (0, 256, 2048)):
+            assets = [{'id': 1, 'name': 'photo.jpg', 'data': data_url(kb)}] if kb else []
+            body = {'product': {'name': 'Bench Mug', 'vibe': 'Fun & quirky'}, 'assets': assets, 'platforms': PLATFORM_IDS[:count]}
+            results[f'launch.platforms_{count}.asset_{kb}kb'] = timed(lambda: client.post('/api/launch', json=body), runs)
+            if kb:
+                ref = client.post('/api/assets?name=photo.jpg', data=os.urandom(kb * 1024), content_type='image/jpeg').get_json()
+                ref_body = dict(body, assets=[dict(ref, id=1)])
+                results[f'launch.platforms_{count}.asset_{kb}kb_ref'] = timed(lambda: client.post('/api/launch', json=ref_body), runs)
+    return results
+
+
+def bench_pause(client, scheduler, quick: bool) -> Dict:
+    """POST /api/campaign/<id>/pause latency as the total job count grows"""
+    results = {}
+    far_future = datetime.now() + timedelta(days=365)
+    filler = 0
+    for total in ((100, 500) if quick else (100, 1000, 3000)):
+        while len(scheduler.get_jobs()) < total:
+            scheduler.add_job(_noop, 'date', run_date=far_future, id=f'bench_filler_{filler}')
+            filler += 1
+        runs = 5 if quick else 10
+        samples = []
+        for _ in range(runs):
+            campaign_id = client.post('/api/launch', json={'product': {'name': 'Pause'}, 'platforms': ['bluesky', 'reddit']}).json['campaign_id']
+            started = time.perf_counter()
+            client.post(f'/api/campaign/{campaign_id}/pause')
+            samples.append(time.perf_counter() - started)
+        results[f'pause.jobs_{total}'] = stats(samples)
+    return results
+
+
+def bench_jobstore(workdir: Path, quick: bool) -> Dict:
+    """SQLite jobstore add and fire throughput on a dedicated scheduler"""
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+
+    count = 200 if quick else 1000
+    scheduler = BackgroundScheduler(jobstores={'default': SQLAlchemyJobStore(url=f"sqlite:///{workdir / 'bench_jobs.sqlite'}")})
+    scheduler.start(paused=True)
+    _fired.update(count=0, target=count)
+    _fired['done'].clear()
+
+    run_date = datetime.now()
+    started = time.perf_counter()
+    for i in range(count):
+        scheduler.add_job(_count_fire, 'date', run_date=run_date, id=f'bench_fire_{i}', misfire_grace_time=3600)
+    add_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scheduler.resume()
+    _fired['done'].wait(timeout=300)
+    fire_seconds = time.perf_counter() - started
+    scheduler.shutdown(wait=True)
+    return {
+        'jobstore.add': {'jobs': count, 'per_sec': round(count / add_seconds, 1)},
+        'jobstore.fire': {'jobs': _fired['count'], 'per_sec': round(_fired['count'] / fire_seconds, 1)}
+    }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Just enough of the Bluesky and Mastodon APIs for PlatformManager.post, plus a webhook receiver"""
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    webhook_events = 0
+    webhook_lock = threading.Lock()
+
+    def _reply(self, payload: Dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if self.path == '/hook':
+            with self.webhook_lock:
+                StandInHandler.webhook_events += len(json.loads(body)['events'])
+            self._reply({})
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        post_id = random.getrandbits(48)
+        routes = {
+            '/xrpc/com.atproto.server.createSession': {'accessJwt': 'jwt', 'did': 'did:plc:bench', 'handle': 'bench.test'},
+            '/xrpc/com.atproto.repo.createRecord': {'uri': f'at://did:plc:bench/app.bsky.feed.post/{post_id}'},
+            '/api/v1/accounts/verify_credentials': {'id': '1', 'username': 'bench'},
+            '/api/v1/statuses': {'id': str(post_id), 'url': f'http://localhost/@bench/{post_id}'}
+        }
+        if self.path in routes:
+            self._reply(routes[self.path])
+        else:
+            self._reply({'error': 'not found'}, 404)
+
+    do_GET = _route
+    do_POST = _route
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops SYNs under concurrency (1 s retransmit stalls)
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def bench_platform_post(quick: bool, latency_ms: float) -> Dict:
+    """PlatformManager.post against a local stand-in server, sequential and concurrent"""
+    from tools.platform_tools import PlatformManager
+
+    StandInHandler.latency = latency_ms / 1000
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    manager = PlatformManager(credentials={
+        'BLUESKY_HANDLE': 'bench.test', 'BLUESKY_APP_PASSWORD': 'x', 'BLUESKY_SERVICE': base,
+        'MASTODON_INSTANCE': base, 'MASTODON_ACCESS_TOKEN': 'x'
+    })
+
+    results = {}
+    runs = 30 if quick else 200
+    for pid in ('bluesky', 'mastodon'):
+        results[f'platform_post.{pid}'] = timed(lambda: manager.post(pid, 'Benchmark post #bench https://example.com'), runs)
+        assert manager.post(pid, 'check')['success'], f'{pid} stand-in post failed'
+
+        total = runs * 2
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: manager.post(pid, 'Concurrent benchmark post'), range(total)))
+        results[f'platform_post.{pid}.concurrent_8'] = {'posts': total, 'per_sec': round(total / (time.perf_counter() - started), 1)}
+    server.shutdown()
+    return results
+
+
+def bench_webhooks(workdir: Path, quick: bool) -> Dict:
+    """WebhookDispatcher: enqueue cost on the posting thread and delivery to four local endpoints"""
+    from tools.webhooks import WebhookDispatcher
+
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/hook'
+    dispatcher = WebhookDispatcher(str(workdir / 'bench_webhooks.sqlite'), allow_private=True)
+    endpoints = 4
+    for _ in range(endpoints):
+        dispatcher.subscribe('bench', url)
+
+    count = 2000 if quick else 20000
+    StandInHandler.webhook_events = 0
+    started = time.perf_counter()
+    for i in range(count):
+        dispatcher.enqueue('bench', 'post-sent', {'campaign_id': 'camp_bench', 'platform': 'bluesky', 'post_id': str(i)})
+    enqueued = time.perf_counter() - started
+    expected = count * endpoints
+    while StandInHandler.webhook_events < expected and time.perf_counter() - started < 120:
+        time.sleep(0.01)
+    delivered = time.perf_counter() - started
+    assert StandInHandler.webhook_events >= expected, 'webhook events were not all delivered'
+    dispatcher.shutdown()
+    server.shutdown()
+    return {
+        'webhooks.enqueue': {'events': count, 'per_sec': round(count / enqueued, 1)},
+        'webhooks.delivered': {'events': expected, 'per_sec': round(expected / delivered, 1)}
+    }
+
+
+class StubLLM:
+    """Returns canned responses shaped like LangChain AIMessages"""
+
+    def __init__(self, structured_payload=None, text: str = '', repair_text: str = ''):
+        self.structured_payload = structured_payload
+        self.text = text
+        self.repair_text = repair_text
+
+    def invoke(self, prompt, max_tokens=None):
+        usage = {'input_tokens': 900, 'output_tokens': 180, 'input_token_details': {'cache_read': 800}}
+        repairing = len(prompt) > 2
+        if self.structured_payload is not None and not repairing:
+            return SimpleNamespace(tool_calls=[{'args': self.structured_payload}], invalid_tool_calls=[], content='', usage_metadata=usage)
+        return SimpleNamespace(tool_calls=[], invalid_tool_calls=[], content=self.repair_text if repairing else self.text, usage_metadata=usage)
+
+
+def bench_generate_post(quick: bool) -> Dict:
+    """ContentAgent.generate_post: no-LLM fallback, structured, text-JSON and repair paths"""
+    from agents.content_agent import ContentAgent
+
+    post = {
+        'content': 'Meet the mug that keeps coffee hot for 6 hours. Perfect for long mornings https://example.com/mug',
+        'hashtags': ['coffee', 'mug'],
+        'media_suggestions': ['Mug on a desk at sunrise'],
+        'engagement_hooks': ['What is in your mug today?']
+    }
+    text = 'Sure! Here is your post:\n```json\n' + json.dumps(post)[:-1] + ',}\n```\nHope it helps'
+    missing = {k: v for k, v in post.items() if k != 'hashtags'}
+    paths = {
+        'fallback': (None, None),
+        'structured': (StubLLM(), StubLLM(structured_payload=post)),
+        'text_json': (StubLLM(text=text), None),
+        'repair': (StubLLM(repair_text='{"hashtags": ["coffee", "mug"]}'), StubLLM(structured_payload=missing, repair_text='{"hashtags": ["coffee", "mug"]}'))
+    }
+
+    results = {}
+    runs = 200 if quick else 2000
+    agent = ContentAgent()
+    for name, (llm, structured_llm) in paths.items():
+        agent.llm, agent.structured_llm = llm, structured_llm
+        generated = agent.generate_post('linkedin', 'Bench Mug', 'A mug that keeps coffee hot')
+        assert generated['content'], f'{name} path produced no content'
+        results[f'generate_post.{name}'] = timed(lambda: agent.generate_post('linkedin', 'Bench Mug', 'A mug that keeps coffee hot'), runs)
+    return results
+
+
+def bench_adapt(quick: bool) -> Dict:
+    """adapt_content / adapt_campaign over a large batch of varied posts"""
+    from agents.content_agent import ContentAgent
+
+    rng = random.Random(42)
+    words = ['launch', 'coffee', 'handmade', 'ceramic', 'gift', 'morning', 'ritual', 'limited', 'drop', 'today']
+    posts = []
+    for _ in range(500 if quick else 5000):
+        sentences = [' '.join(rng.choices(words, k=rng.randint(5, 18))).capitalize() + rng.choice(['.', '!', '?']) for _ in range(rng.randint(2, 30))]
+        posts.append(' '.join(sentences) + ' https://example.com/p/' + str(rng.randint(1, 10 ** 6)) + ' ☕🔥 #coffee #handmade')
+
+    agent = ContentAgent()
+    targets = ['x', 'linkedin', 'reddit', 'instagram', 'tiktok', 'threads']
+    results = {}
+    for name, fn in (('adapt_content', lambda p: agent.adapt_content(p, 'linkedin', 'x')),
+                     ('adapt_campaign', lambda p: agent.adapt_campaign(p, targets))):
+        started = time.perf_counter()
+        for p in posts:
+            fn(p)
+        elapsed = time.perf_counter() - started
+        results[f'adapt.{name}'] = {'posts': len(posts), 'per_sec': round(len(posts) / elapsed, 1)}
+    return results
+
+
+def compare(current: Dict, baseline: Dict):
+    """Print relative change per metric; positive means slower / lower throughput"""
+    for name, value in current.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        if 'median_ms' in value and old.get('median_ms'):
+            change = (value['median_ms'] / old['median_ms'] - 1) * 100
+        elif 'per_sec' in value and old.get('per_sec'):
+            change = (old['per_sec'] / value['per_sec'] - 1) * 100
+        else:
+            continue
+        flag = '  REGRESSION' if change > 10 else ''
+        print(f"{name:<44} {change:+7.1f}%{flag}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='Smaller sizes for a fast smoke run')
+    parser.add_argument('--only', help=f"Comma-separated sections ({', '.join(SECTIONS)})")
+    parser.add_argument('--server-latency-ms', type=float, default=0.0, help='Delay added by the stand-in platform server')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--compare', help='Earlier --json output to diff against')
+    args = parser.parse_args()
+    sections = args.only.split(',') if args.only else SECTIONS
+
+    sys.path.insert(0, str(ROOT))
+    workdir = Path(tempfile.mkdtemp(prefix='mandy-bench-'))
+    os.chdir(workdir)
+    logging.disable(logging.WARNING)
+    # Offline: no model provider, no real accounts
+    for key in ('ANTHROPIC_API_KEY', 'OPENAI_API_KEY', 'MANDY_VAULT_PASSPHRASE'):
+        os.environ.pop(key, None)
+
+    results: Dict[str, Dict] = {}
+    if 'launch' in sections or 'pause' in sections:
+        import mandy
+        app = mandy.create_app()
+        client = app.test_client()
+        if 'launch' in sections:
+            results.update(bench_launch(client, args.quick))
+        if 'pause' in sections:
+            results.update(bench_pause(client, mandy.scheduler, args.quick))
+        mandy.shutdown_services()
+    if 'jobstore' in sections:
+        results.update(bench_jobstore(workdir, args.quick))
+    if 'platform_post' in sections:
+        results.update(bench_platform_post(args.quick, args.server_latency_ms))
+    if 'generate_post' in sections:
+        results.update(bench_generate_post(args.quick))
+    if 'adapt' in sections:
+        results.update(bench_adapt(args.quick))
+    if 'webhooks' in sections:
+        results.update(bench_webhooks(workdir, args.quick))
+
+    for name, value in results.items():
+        summary = f"median {value['median_ms']:>9.3f} ms  p95 {value['p95_ms']:>9.3f} ms" if 'median_ms' in value else f"{value['per_sec']:>10.1f} /s"
+        print(f"{name:<44} {summary}")
+
+    if args.compare:
+        print(f"\nvs {args.compare}:")
+        compare(results, json.loads(Path(args.compare).read_text())['results'])
+    if args.json:
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        except OSError:
+            commit = ''
+        meta = {
+            'commit': commit,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'timestamp': datetime.now().isoformat(),
+            'quick': args.quick
+        }
+        Path(args.json).write_text(json.dumps({'meta': meta, 'results': results}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
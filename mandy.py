@@ -3,52 +3,340 @@ Marketing Mandy - Conversational AI Marketing Assistant
 Dead simple: Chat with Mandy -> Drop your stuff -> Hit Market -> Done
 """
 import os
+import re
+import gzip
 import json
+import time
+import uuid
+import base64
+import bisect
+import hmac
+import hashlib
+import mimetypes
+import threading
+from queue import Empty, Queue
 from pathlib import Path
-from datetime import datetime, timedelta
-from flask import Flask, render_template_string, jsonify, request
-from flask_cors import CORS
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import unquote_to_bytes
+from flask import Blueprint, Flask, Response, g, render_template_string, jsonify, redirect, request, send_from_directory
+from tools.metrics import HTTP_LATENCY, POST_LATENCY, POSTS, QUEUE_DEPTH, SCHEDULER_JOBS, SCHEDULER_LAG, render_all
+from tools import platforms, tracing
+from tools.tracing import span
+from tools.workspaces import DEFAULT_WORKSPACE, WorkspaceRouter, unscoped
 
-app = Flask(__name__)
-CORS(app)
+# Routes are registered on the app built by create_app()
+bp = Blueprint('mandy', __name__)
 
 # Storage
 UPLOAD_FOLDER = Path('./uploads')
-UPLOAD_FOLDER.mkdir(exist_ok=True)
-
-# Scheduler setup
-jobstores = {'default': SQLAlchemyJobStore(url='sqlite:///mandy_jobs.sqlite')}
-scheduler = BackgroundScheduler(jobstores=jobstores)
-scheduler.start()
-
-# Campaign state
-campaigns = {}
-
-DEFAULT_SCHEDULES = {
-    'instagram': {'times': ['11:00', '21:00'], 'days': 'daily'},
-    'x': {'times': ['09:00', '12:00', '17:00'], 'days': 'daily'},
-    'linkedin': {'times': ['07:30', '12:00'], 'days': 'weekdays'},
-    'facebook': {'times': ['09:00', '13:00', '19:00'], 'days': 'daily'},
-    'tiktok': {'times': ['12:00', '19:00', '22:00'], 'days': 'daily'},
-    'reddit': {'times': ['10:00', '19:00'], 'days': 'daily'},
-    'youtube': {'times': ['15:00'], 'days': 'daily'},
-    'threads': {'times': ['09:00', '18:00'], 'days': 'daily'},
-    'pinterest': {'times': ['14:00', '21:00'], 'days': 'daily'}
-}
+JOBS_DB = 'mandy_jobs.sqlite'
+WEBHOOKS_DB = 'mandy_webhooks.sqlite'
+CREDS_FILE = Path('./credentials.json')
+
+# Largest accepted request body (one file per POST /api/assets)
+MAX_REQUEST_MB = int(os.getenv('MANDY_MAX_REQUEST_MB', '50'))
+
+# Front-end assets, precompiled once by create_app()
+STATIC_DIR = Path(__file__).resolve().parent / 'static'
+COMPRESSIBLE = {'.js', '.css', '.html', '.svg', '.json', '.txt'}
+mimetypes.add_type('font/woff2', '.woff2')
+precompiled_page = None
+precompiled_assets = {}
+
+# Self-hosted fonts (SIL OFL, licence texts in static/fonts/). DM Sans ships as a
+# Latin-subset variable woff2; Syne is used from a local install, or from
+# static/fonts/syne.woff2 when that file is present. System fonts otherwise.
+FONT_FACES = [
+    ('DM Sans', 'fonts/dm-sans.woff2', '100 1000', []),
+    ('Syne', 'fonts/syne.woff2', '700 800', ['Syne', 'Syne-Bold']),
+]
+PRELOAD_FONT = 'fonts/dm-sans.woff2'
+
+# Background services (started by create_app)
+scheduler = None
+# One scheduler per workspace shard, by shard name ('default' is the scheduler above)
+shard_schedulers = {}
+dedup_index = None
+content_buffer = None
+event_bus = None
+engagement_store = None
+engagement_collector = None
+webhooks = None
+# Runs the per-platform generators behind /api/generate/stream
+preview_executor = None
+
+# Seconds between SSE keep-alive comments on idle streams
+EVENT_KEEPALIVE = 15
 
-PLATFORMS = {
-    'instagram': {'icon': '📸', 'name': 'Instagram', 'max_chars': 2200},
-    'x': {'icon': '𝕏', 'name': 'X (Twitter)', 'max_chars': 280},
-    'linkedin': {'icon': '💼', 'name': 'LinkedIn', 'max_chars': 3000},
-    'facebook': {'icon': '📘', 'name': 'Facebook', 'max_chars': 63206},
-    'tiktok': {'icon': '🎵', 'name': 'TikTok', 'max_chars': 2200},
-    'reddit': {'icon': '🔶', 'name': 'Reddit', 'max_chars': 40000},
-    'youtube': {'icon': '📺', 'name': 'YouTube', 'max_chars': 5000},
-    'threads': {'icon': '🧵', 'name': 'Threads', 'max_chars': 500},
-    'pinterest': {'icon': '📌', 'name': 'Pinterest', 'max_chars': 500}
+# Per-client credentials, campaigns and job shards, picked per request by select_workspace()
+workspaces = WorkspaceRouter(
+    Path(os.getenv('MANDY_WORKSPACES_DIR', './workspaces')),
+    shards=int(os.getenv('MANDY_JOB_SHARDS', '8')),
+    default_credentials=CREDS_FILE
+)
+
+# Campaign API: list defaults, page size cap, and the smallest response worth gzipping
+CAMPAIGN_SUMMARY_FIELDS = ('id', 'status', 'platforms', 'created_at')
+MAX_PAGE_SIZE = 100
+COMPRESS_MIN_BYTES = 1024
+# Uploads are stored as <sha256><ext> and streamed to disk a chunk at a time.
+# Only raster images and video: anything a browser could run (SVG, HTML) is refused.
+UPLOAD_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/gif': '.gif',
+    'video/mp4': '.mp4',
+    'video/quicktime': '.mov',
+    'video/webm': '.webm',
 }
+UPLOAD_NAME = re.compile(r'[0-9a-f]{64}(%s)' % '|'.join(re.escape(ext) for ext in UPLOAD_TYPES.values()))
+UPLOAD_MIMETYPES = {ext: mimetype for mimetype, ext in UPLOAD_TYPES.items()}
+UPLOAD_CHUNK = 1024 * 1024
+# Bytes each workspace may upload, and how long files no campaign uses are kept
+UPLOAD_QUOTA_BYTES = int(os.getenv('MANDY_UPLOAD_QUOTA_MB', '500')) * 1024 * 1024
+UPLOAD_TTL_HOURS = float(os.getenv('MANDY_UPLOAD_TTL_HOURS', '24'))
+# Scaled copies of one asset (one per platform image limit) sent at launch
+MAX_ASSET_VARIANTS = 16
+DATA_URL = re.compile(r'data:([\w.+-]+/[\w.+-]+)?[^,]*?(;base64)?,', re.IGNORECASE)
+
+# Content generation (created on first use)
+content_agent = None
+_content_agent_lock = threading.Lock()
+
+
+def get_content_agent():
+    global content_agent
+    if content_agent is None:
+        with _content_agent_lock:
+            # Concurrent first requests build one agent (and one LLM client), not one each
+            if content_agent is None:
+                from agents import ContentAgent
+                content_agent = ContentAgent()
+    return content_agent
+
+
+# Platform posting (created on first dispatch)
+platform_manager = None
+_platform_manager_lock = threading.Lock()
+
+
+def get_platform_manager():
+    global platform_manager
+    if platform_manager is None:
+        with _platform_manager_lock:
+            if platform_manager is None:
+                from tools import PlatformManager
+                platform_manager = PlatformManager()
+    return platform_manager
+
+
+def create_app(start_scheduler: bool = True) -> Flask:
+    """Build the Flask app and start the scheduler and content services"""
+    global scheduler, dedup_index, content_buffer, event_bus, engagement_store, engagement_collector, webhooks
+    global preview_executor
+    global precompiled_page, precompiled_assets
+    from flask_cors import CORS
+    
+    app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_MB * 1024 * 1024
+    CORS(app)
+    app.register_blueprint(bp)
+    
+    # Render and compress the page once instead of on every hit
+    precompiled_assets = _load_assets()
+    with app.app_context():
+        preload_font = PRELOAD_FONT if PRELOAD_FONT in precompiled_assets else None
+        html = render_template_string(HTML_TEMPLATE, asset_url=asset_url, font_faces=_font_face_css(), preload_font=preload_font,
+                                      platform_info=json.dumps(platform_info()),
+                                      image_limits=json.dumps(platforms.image_limits()), upload_types=','.join(UPLOAD_TYPES))
+    precompiled_page = _precompile(html.encode(), 'text/html')
+    
+    if scheduler is None:
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+        from agents import ContentBuffer
+        from tools import EngagementCollector, EngagementStore, EventBus, NearDuplicateIndex, WebhookDispatcher
+        
+        UPLOAD_FOLDER.mkdir(exist_ok=True)
+        
+        # The default workspace keeps the original file; the others are spread over
+        # shards, each its own scheduler so they don't share one lock and wakeup loop
+        scheduler = BackgroundScheduler(jobstores={'default': SQLAlchemyJobStore(url=f'sqlite:///{JOBS_DB}')})
+        shard_schedulers['default'] = scheduler
+        workspaces.root.mkdir(parents=True, exist_ok=True)
+        for shard, url in workspaces.shard_urls().items():
+            shard_schedulers[shard] = BackgroundScheduler(jobstores={'default': SQLAlchemyJobStore(url=url)})
+        for shard_scheduler in shard_schedulers.values():
+            shard_scheduler.add_listener(record_job_event)
+            if start_scheduler:
+                shard_scheduler.start()
+        
+        # Everything posted or queued, per platform and workspace, to keep near-duplicates out
+        dedup_index = NearDuplicateIndex(JOBS_DB, threshold=float(os.getenv('MANDY_DEDUP_THRESHOLD', '0.7')))
+        
+        # Pre-generated posts, stored next to the scheduled jobs
+        content_buffer = ContentBuffer(
+            JOBS_DB,
+            get_content_agent,
+            days=int(os.getenv('MANDY_PREGEN_DAYS', '3')),
+            max_workers=int(os.getenv('MANDY_PREGEN_WORKERS', '2')),
+            dedup_index=dedup_index
+        )
+        if start_scheduler:
+            # Posts buffered for campaigns whose jobs are gone would never be popped
+            scheduled = {job.args[0] for s in shard_schedulers.values() for job in s.get_jobs() if job.args}
+            for campaign_id in content_buffer.campaign_ids() - scheduled:
+                content_buffer.discard(campaign_id)
+        
+        QUEUE_DEPTH.callback = queue_depth
+        
+        # Dispatch outcomes for /api/events subscribers
+        event_bus = EventBus(buffer_size=int(os.getenv('MANDY_EVENT_BUFFER', '256')))
+        
+        # Live previews: one generator per platform, shared by all open streams
+        from concurrent.futures import ThreadPoolExecutor
+        preview_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('MANDY_PREVIEW_WORKERS', '8')), thread_name_prefix='mandy-preview'
+        )
+        
+        # Post outcomes for subscribed endpoints; its own file so delivery never contends with jobs
+        webhooks = WebhookDispatcher(WEBHOOKS_DB, batch_size=int(os.getenv('MANDY_WEBHOOK_BATCH', '100')))
+        
+        # Likes/reposts/replies of published posts, bucketed by hour of week
+        engagement_store = EngagementStore(JOBS_DB, track_days=int(os.getenv('MANDY_ENGAGEMENT_DAYS', '7')))
+        engagement_collector = EngagementCollector(engagement_store, fetch_engagement)
+        scheduler.add_job(
+            collect_engagement,
+            'interval',
+            minutes=int(os.getenv('MANDY_ENGAGEMENT_MINUTES', '30')),
+            id='mandy_engagement',
+            replace_existing=True
+        )
+        
+        # Uploads nobody launched with, and copies superseded by re-scaled ones
+        scheduler.add_job(cleanup_uploads, 'interval', hours=1, id='mandy_upload_cleanup', replace_existing=True)
+        
+        # Derive the vault key now rather than on the first credentials request
+        workspaces.get(DEFAULT_WORKSPACE).credential_store.get()
+        if start_scheduler:
+            resolve_account_keys_later(workspaces.get(DEFAULT_WORKSPACE))
+    
+    return app
+
+
+def platform_info() -> Dict[str, Dict]:
+    """What the page shows about each platform, straight from the registry"""
+    return {
+        spec['id']: {'name': spec['name'], 'icon': spec['icon'], 'status': spec['status'], 'schedule': spec['schedule']}
+        for spec in platforms.all_platforms()
+    }
+
+
+def _precompile(body: bytes, mimetype: str, compress: bool = True) -> Dict:
+    """Body plus gzip/brotli variants, keyed by a content digest"""
+    variants = {'identity': body}
+    if compress:
+        variants['gzip'] = gzip.compress(body, 9)
+        try:
+            import brotli
+            variants['br'] = brotli.compress(body, quality=11)
+        except ImportError:
+            pass
+    return {'digest': hashlib.sha256(body).hexdigest()[:12], 'mimetype': mimetype, 'variants': variants}
+
+
+def _load_assets() -> Dict[str, Dict]:
+    assets = {}
+    for path in STATIC_DIR.rglob('*'):
+        if path.is_file():
+            name = path.relative_to(STATIC_DIR).as_posix()
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            assets[name] = _precompile(path.read_bytes(), mimetype, path.suffix in COMPRESSIBLE)
+    return assets
+
+
+def asset_url(name: str) -> str:
+    """Content-hashed URL for a file in static/"""
+    return f"/assets/{precompiled_assets[name]['digest']}/{name}"
+
+
+def _font_face_css() -> str:
+    rules = []
+    for family, filename, weight, local_names in FONT_FACES:
+        sources = [f"local('{n}')" for n in local_names]
+        if filename in precompiled_assets:
+            sources.append(f"url('{asset_url(filename)}') format('woff2')")
+        rules.append(
+            f"@font-face {{ font-family: '{family}'; font-weight: {weight}; "
+            f"font-display: swap; src: {', '.join(sources)}; }}"
+        )
+    return '\n        '.join(rules)
+
+
+def _send_precompiled(asset: Dict, cache_control: str) -> Response:
+    """Serve the best encoding the client accepts, with ETag / 304 support"""
+    encoding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in asset['variants'] and request.accept_encodings.quality(candidate) > 0:
+            encoding = candidate
+            break
+    
+    response = Response(asset['variants'][encoding], mimetype=asset['mimetype'])
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    response.set_etag(f"{asset['digest']}-{encoding}")
+    return response.make_conditional(request)
+
+
+def record_job_event(event):
+    """Scheduler lag and job outcomes for /metrics"""
+    from apscheduler import events
+    outcome = {
+        events.EVENT_JOB_SUBMITTED: 'submitted',
+        events.EVENT_JOB_EXECUTED: 'executed',
+        events.EVENT_JOB_ERROR: 'error',
+        events.EVENT_JOB_MISSED: 'missed',
+        events.EVENT_JOB_MAX_INSTANCES: 'max_instances'
+    }.get(event.code)
+    if outcome is None:
+        return
+    SCHEDULER_JOBS.inc(outcome)
+    if outcome == 'submitted':
+        lag = datetime.now(timezone.utc) - max(event.scheduled_run_times)
+        SCHEDULER_LAG.observe(lag.total_seconds())
+
+
+def scheduler_for(workspace):
+    """Scheduler that owns the workspace's jobs"""
+    return shard_schedulers[workspace.shard]
+
+
+def queue_depth() -> Dict:
+    depth = {('scheduled_jobs',): sum(len(s.get_jobs()) for s in shard_schedulers.values())}
+    if content_buffer is not None:
+        for name, count in content_buffer.depth().items():
+            depth[(f'buffer_{name}',)] = count
+    if webhooks is not None:
+        depth[('webhook_outbox',)] = webhooks.pending()
+    return depth
+
+
+def shutdown_services():
+    """Stop background work, letting posts that are already running finish"""
+    for shard_scheduler in shard_schedulers.values():
+        if shard_scheduler.running:
+            shard_scheduler.shutdown(wait=True)
+    if content_buffer is not None:
+        content_buffer.shutdown(wait=True)
+    if webhooks is not None:
+        webhooks.shutdown(wait=True)
+    if preview_executor is not None:
+        preview_executor.shutdown(wait=False, cancel_futures=True)
+
 
 HTML_TEMPLATE = '''<!DOCTYPE html>
 <html lang="en">
@@ -56,8 +344,9 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Marketing Mandy</title>
-    <link href="https://fonts.googleapis.com/css2?family=DM+Sans:wght@400;500;600;700&family=Syne:wght@700;800&display=swap" rel="stylesheet">
+    {% if preload_font %}<link rel="preload" href="{{ asset_url(preload_font) }}" as="font" type="font/woff2" crossorigin>{% endif %}
     <style>
+        {{ font_faces|safe }}
         :root {
             --bg: #0d0d12; --bg-chat: #16161e; --bg-input: #1e1e28;
             --accent: #ff2d92; --accent-glow: rgba(255, 45, 146, 0.3);
@@ -65,10 +354,10 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
             --text: #ffffff; --text-dim: #8888aa; --border: #2a2a3a;
         }
         * { margin: 0; padding: 0; box-sizing: border-box; }
-        body { font-family: 'DM Sans', sans-serif; background: var(--bg); color: var(--text); height: 100vh; display: flex; flex-direction: column; }
+        body { font-family: 'DM Sans', system-ui, -apple-system, 'Segoe UI', sans-serif; background: var(--bg); color: var(--text); height: 100vh; display: flex; flex-direction: column; }
         .header { padding: 1rem 1.5rem; border-bottom: 1px solid var(--border); display: flex; align-items: center; gap: 1rem; background: var(--bg-chat); }
         .mandy-avatar { width: 48px; height: 48px; border-radius: 50%; background: linear-gradient(135deg, var(--accent), #b14aff); display: flex; align-items: center; justify-content: center; font-size: 1.5rem; box-shadow: 0 0 20px var(--accent-glow); }
-        .header-text h1 { font-family: 'Syne', sans-serif; font-size: 1.3rem; background: linear-gradient(135deg, var(--accent), var(--blue)); -webkit-background-clip: text; -webkit-text-fill-color: transparent; }
+        .header-text h1 { font-family: 'Syne', system-ui, -apple-system, 'Segoe UI', sans-serif; font-size: 1.3rem; background: linear-gradient(135deg, var(--accent), var(--blue)); -webkit-background-clip: text; -webkit-text-fill-color: transparent; }
         .header-text p { font-size: 0.8rem; color: var(--text-dim); }
         .status-dot { width: 8px; height: 8px; background: var(--green); border-radius: 50%; margin-left: auto; animation: pulse 2s infinite; }
         @keyframes pulse { 0%, 100% { opacity: 1; } 50% { opacity: 0.5; } }
@@ -111,7 +400,7 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
         .attach-btn:hover { color: var(--accent); }
         .send-btn { background: linear-gradient(135deg, var(--accent), #b14aff); border: none; width: 48px; height: 48px; border-radius: 50%; display: flex; align-items: center; justify-content: center; cursor: pointer; font-size: 1.2rem; transition: transform 0.2s; }
         .send-btn:hover { transform: scale(1.05); box-shadow: 0 0 20px var(--accent-glow); }
-        .market-btn { width: 100%; background: linear-gradient(135deg, var(--green), #00b368); border: none; padding: 1rem; border-radius: 16px; font-family: 'Syne', sans-serif; font-weight: 700; font-size: 1.2rem; color: #000; cursor: pointer; margin-top: 1rem; display: none; }
+        .market-btn { width: 100%; background: linear-gradient(135deg, var(--green), #00b368); border: none; padding: 1rem; border-radius: 16px; font-family: 'Syne', system-ui, -apple-system, 'Segoe UI', sans-serif; font-weight: 700; font-size: 1.2rem; color: #000; cursor: pointer; margin-top: 1rem; display: none; }
         .market-btn.visible { display: block; animation: fadeIn 0.3s ease; }
         .market-btn:hover { transform: scale(1.02); box-shadow: 0 0 30px rgba(0, 255, 136, 0.4); }
         .typing-indicator { display: flex; gap: 4px; padding: 1rem; }
@@ -127,7 +416,7 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
         .modal-overlay.active { display: flex; }
         .modal { background: var(--bg-chat); border: 1px solid var(--border); border-radius: 20px; width: 100%; max-width: 600px; max-height: 90vh; overflow: hidden; display: flex; flex-direction: column; }
         .modal-header { padding: 1.25rem 1.5rem; border-bottom: 1px solid var(--border); display: flex; align-items: center; justify-content: space-between; }
-        .modal-header h2 { font-family: 'Syne', sans-serif; font-size: 1.2rem; }
+        .modal-header h2 { font-family: 'Syne', system-ui, -apple-system, 'Segoe UI', sans-serif; font-size: 1.2rem; }
         .modal-close { background: none; border: none; color: var(--text-dim); font-size: 1.2rem; cursor: pointer; }
         .modal-close:hover { color: var(--text); }
         .modal-body { padding: 1.5rem; overflow-y: auto; flex: 1; }
@@ -163,9 +452,11 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
         .platform-card.coming-soon .platform-card-header { cursor: default; }
         .platform-card-status.coming-soon { background: rgba(255,200,0,0.2); color: #ffcc00; }
         .coming-soon-msg { color: var(--text-dim); font-style: italic; padding: 0.5rem 0; }
+        .post-preview { white-space: pre-wrap; margin-top: 0.5rem; color: var(--text-dim); }
+        .post-preview.done { color: var(--text); }
     </style>
 </head>
-<body>
+<body data-platforms="{{ platform_info }}" data-image-limits="{{ image_limits }}">
     <div class="header">
         <div class="mandy-avatar">👩‍💼</div>
         <div class="header-text"><h1>Marketing Mandy</h1><p>Your AI Posting Homie</p></div>
@@ -204,38 +495,60 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
         </div>
         <button class="market-btn" id="marketBtn">🚀 START MARKETING</button>
     </div>
-    <input type="file" id="fileInput" multiple accept="image/*,video/*" style="display:none" onchange="handleFiles(event)">
-    <script src="/static/mandy.js"></script>
+    <input type="file" id="fileInput" multiple accept="{{ upload_types }}" style="display:none" onchange="handleFiles(event)">
+    <script src="{{ asset_url('mandy.js') }}"></script>
 </body>
 </html>'''
 
 
-@app.route('/')
+@bp.route('/')
 def index():
-    response = app.make_response(render_template_string(HTML_TEMPLATE))
+    response = _send_precompiled(precompiled_page, 'no-cache')
     response.headers['Content-Security-Policy'] = "default-src * 'unsafe-inline' 'unsafe-eval' data: blob:;"
     return response
 
 
-@app.route('/api/launch', methods=['POST'])
+@bp.route('/assets/<digest>/<path:filename>')
+def hashed_asset(digest, filename):
+    """Static files under content-hashed URLs, cached forever by clients"""
+    asset = precompiled_assets.get(filename)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    if digest != asset['digest']:
+        # Page from before a deploy - point it at the current content
+        return redirect(asset_url(filename))
+    return _send_precompiled(asset, 'public, max-age=31536000, immutable')
+
+
+@bp.route('/api/launch', methods=['POST'])
 def launch_campaign():
-    data = request.json
-    campaign_id = f"camp_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    with span('launch_campaign.parse_json', bytes=request.content_length):
+        data = request.json
+    campaign_id = f"camp_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+    
+    try:
+        with span('launch_campaign.store_assets', count=len(data.get('assets', []))):
+            assets = [store_asset(asset) for asset in data.get('assets', [])]
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid asset data'}), 400
     
     campaign = {
         'id': campaign_id,
         'product': data.get('product', {}),
-        'assets': data.get('assets', []),
+        'assets': assets,
         'platforms': data.get('platforms', []),
         'status': 'active',
-        'created_at': datetime.now().isoformat()
+        'created_at': datetime.now().isoformat(),
+        'workspace': g.workspace.id
     }
-    campaigns[campaign_id] = campaign
+    workspace = g.workspace
+    workspace.campaigns[campaign_id] = campaign
+    bisect.insort(workspace.campaign_index, campaign_id)
     
     # Schedule posts for each platform
+    next_post = None
     for platform_id in campaign['platforms']:
-        schedule = DEFAULT_SCHEDULES.get(platform_id, {'times': ['12:00']})
-        for time_str in schedule['times']:
+        for time_str in posting_times(platform_id, workspace):
             hour, minute = map(int, time_str.split(':'))
             now = datetime.now()
             post_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
@@ -243,158 +556,742 @@ def launch_campaign():
                 post_time += timedelta(days=1)
             
             job_id = f"{campaign_id}_{platform_id}_{time_str.replace(':', '')}"
-            scheduler.add_job(
-                execute_post,
-                'interval',
-                days=1,
-                start_date=post_time,
-                args=[campaign_id, platform_id],
-                id=job_id
-            )
+            with span('scheduler.add_job', job_id=job_id):
+                scheduler_for(workspace).add_job(
+                    execute_post,
+                    'interval',
+                    days=1,
+                    start_date=post_time,
+                    args=[campaign_id, platform_id, workspace.id],
+                    id=job_id
+                )
+            publish_event('post-scheduled', campaign_id, platform_id, workspace.id, job_id=job_id, run_at=post_time.isoformat())
+            if next_post is None or post_time < next_post[1]:
+                next_post = (platform_id, post_time)
     
-    return jsonify({'success': True, 'campaign_id': campaign_id})
+    with span('launch_campaign.refill_buffer'):
+        refill_buffer(campaign)
+    response = {'success': True, 'campaign_id': campaign_id}
+    if next_post:
+        response['next_post'] = {'platform': next_post[0], 'run_at': next_post[1].isoformat()}
+    return jsonify(response)
 
 
-@app.route('/api/campaign/<campaign_id>', methods=['GET'])
+@bp.route('/api/campaign/<campaign_id>', methods=['GET'])
 def get_campaign(campaign_id):
+    campaigns = g.workspace.campaigns
     if campaign_id not in campaigns:
         return jsonify({'error': 'Not found'}), 404
-    return jsonify(campaigns[campaign_id])
+    return jsonify(project(campaigns[campaign_id], requested_fields()))
+
+
+@bp.route('/api/campaigns', methods=['GET'])
+def list_campaigns():
+    """Newest first, filtered by status/platform; pass next_cursor back as cursor"""
+    status = request.args.get('status')
+    platform = request.args.get('platform')
+    fields = requested_fields() or CAMPAIGN_SUMMARY_FIELDS
+    campaigns, campaign_index = g.workspace.campaigns, g.workspace.campaign_index
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        end = bisect.bisect_left(campaign_index, base64.urlsafe_b64decode(cursor).decode()) if cursor else len(campaign_index)
+    except (ValueError, UnicodeDecodeError):
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
+    
+    page = []
+    position = end
+    while position > 0 and len(page) < limit:
+        position -= 1
+        campaign = campaigns[campaign_index[position]]
+        if status and campaign['status'] != status:
+            continue
+        if platform and platform not in campaign['platforms']:
+            continue
+        page.append(project(campaign, fields))
+    
+    next_cursor = None
+    if position > 0 and page:
+        next_cursor = base64.urlsafe_b64encode(campaign_index[position].encode()).decode()
+    return jsonify({'campaigns': page, 'next_cursor': next_cursor})
+
+
+def requested_fields() -> Optional[list]:
+    """Top-level fields named by ?fields=a,b (None means all)"""
+    fields = request.args.get('fields')
+    return [f for f in fields.split(',') if f] if fields else None
+
+
+def project(campaign: dict, fields: Optional[Iterable[str]]) -> dict:
+    if fields is None:
+        return campaign
+    return {f: campaign[f] for f in fields if f in campaign}
+
+
+def save_upload(chunks: Iterable[bytes], mimetype: str, max_bytes: Optional[int] = None) -> dict:
+    """
+    Write a file to content-addressed storage, hashing it as it streams in; mimetype must be in UPLOAD_TYPES.
+    Raises ValueError once the file grows past max_bytes.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = UPLOAD_FOLDER / f'.upload.{uuid.uuid4().hex}'
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise ValueError('Upload quota exceeded')
+                f.write(chunk)
+        path = UPLOAD_FOLDER / f"{digest.hexdigest()}{UPLOAD_TYPES[mimetype]}"
+        if path.exists():
+            tmp_path.unlink()
+            # Uploaded again: restart its clock so cleanup_uploads() keeps it
+            os.utime(path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return {'type': mimetype, 'size': size, 'sha256': digest.hexdigest(), 'url': f'/uploads/{path.name}'}
+
+
+def upload_room(workspace) -> int:
+    """Bytes the workspace may still upload"""
+    return UPLOAD_QUOTA_BYTES - sum(workspace.uploads.values())
+
+
+def save_workspace_upload(workspace, chunks: Iterable[bytes], mimetype: str) -> dict:
+    """save_upload() within the workspace's quota, recorded in its ledger"""
+    stored = save_upload(chunks, mimetype, max_bytes=upload_room(workspace))
+    workspace.uploads[stored['url']] = stored['size']
+    return stored
+
+
+def stored_upload(url) -> dict:
+    """Fields of a file uploaded through /api/assets; raises ValueError for anything else"""
+    # Only accept files we actually stored
+    filename = url[len('/uploads/'):] if isinstance(url, str) and url.startswith('/uploads/') else ''
+    path = UPLOAD_FOLDER / filename
+    if not UPLOAD_NAME.fullmatch(filename) or not path.is_file():
+        raise ValueError(f'Unknown asset: {url}')
+    return {
+        'type': UPLOAD_MIMETYPES[path.suffix],
+        'size': path.stat().st_size,
+        'sha256': filename.split('.')[0],
+        'url': url
+    }
+
+
+def store_asset(asset: dict) -> dict:
+    """Reference to a stored asset; inline data-URLs are moved into storage first"""
+    variants = asset.get('variants')
+    if variants is not None:
+        # One scaled copy per platform image limit; the largest also fills the top-level fields
+        if not isinstance(variants, list) or not 0 < len(variants) <= MAX_ASSET_VARIANTS:
+            raise ValueError('Invalid asset variants')
+        stored = []
+        for variant in variants:
+            max_edge = variant.get('max_edge') if isinstance(variant, dict) else None
+            if not isinstance(max_edge, int) or max_edge <= 0:
+                raise ValueError('Invalid asset variants')
+            stored.append({**stored_upload(variant.get('url')), 'max_edge': max_edge})
+        stored.sort(key=lambda v: v['max_edge'], reverse=True)
+        return {'id': asset.get('id'), 'name': asset.get('name'), **stored[0], 'variants': stored}
+    
+    data = asset.get('data') or ''
+    match = DATA_URL.match(data)
+    if not match:
+        url = asset.get('url')
+        if url is None:
+            return {k: v for k, v in asset.items() if k != 'data'}
+        return {'id': asset.get('id'), 'name': asset.get('name'), **stored_upload(url)}
+    
+    mimetype = (match.group(1) or '').lower()
+    if mimetype not in UPLOAD_TYPES:
+        raise ValueError(f'Unsupported asset type: {mimetype or "unknown"}')
+    payload = data[match.end():]
+    blob = base64.b64decode(payload, validate=True) if match.group(2) else unquote_to_bytes(payload)
+    stored = save_workspace_upload(g.workspace, [blob], mimetype)
+    return {'id': asset.get('id'), 'name': asset.get('name'), **stored}
+
+
+@bp.route('/api/assets', methods=['POST'])
+def upload_asset():
+    """Raw image or video body, uploaded while the user is still chatting; returns its reference"""
+    mimetype = request.mimetype
+    if mimetype not in UPLOAD_TYPES:
+        return jsonify({'error': 'Only JPEG, PNG, WebP and GIF images and MP4, MOV and WebM videos can be uploaded'}), 415
+    if (request.content_length or 0) > upload_room(g.workspace):
+        return jsonify({'error': 'Upload quota exceeded'}), 413
+    stream = request.stream
+    with span('upload_asset', bytes=request.content_length):
+        try:
+            stored = save_workspace_upload(g.workspace, iter(lambda: stream.read(UPLOAD_CHUNK), b''), mimetype)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 413
+    return jsonify({'name': request.args.get('name', '')[:255], **stored}), 201
+
+
+def cleanup_uploads() -> int:
+    """Scheduler job: delete uploads older than UPLOAD_TTL_HOURS that no campaign uses; returns the count"""
+    referenced = set()
+    for workspace in workspaces:
+        for campaign in list(workspace.campaigns.values()):
+            for asset in campaign.get('assets', ()):
+                for variant in asset.get('variants') or [asset]:
+                    referenced.add(variant.get('url'))
+    
+    cutoff = time.time() - UPLOAD_TTL_HOURS * 3600
+    removed = 0
+    with span('cleanup_uploads'):
+        for path in UPLOAD_FOLDER.iterdir():
+            # Leftovers of interrupted uploads go too
+            if not (UPLOAD_NAME.fullmatch(path.name) or path.name.startswith('.upload.')):
+                continue
+            if f'/uploads/{path.name}' in referenced:
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        for workspace in workspaces:
+            for url in list(workspace.uploads):
+                if not (UPLOAD_FOLDER / url[len('/uploads/'):]).exists():
+                    workspace.uploads.pop(url, None)
+    if removed:
+        print(f"[MANDY] Removed {removed} unused uploads")
+    return removed
+
+
+@bp.route('/uploads/<path:filename>')
+def uploaded_asset(filename):
+    """Content-addressed uploads never change, so clients may cache them forever"""
+    if not UPLOAD_NAME.fullmatch(filename):
+        return jsonify({'error': 'Not found'}), 404
+    response = send_from_directory(UPLOAD_FOLDER.resolve(), filename, mimetype=UPLOAD_MIMETYPES[Path(filename).suffix], max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    # User content: never sniffed into something executable, and inert if opened directly
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = "default-src 'none'; sandbox"
+    return response
 
 
-@app.route('/api/campaign/<campaign_id>/pause', methods=['POST'])
+@bp.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if tracing.enabled():
+        g.request_span = span(request.endpoint or 'unmatched', method=request.method, path=request.path).__enter__()
+
+
+@bp.before_request
+def select_workspace():
+    """Workspace of the request's API token (Authorization: Bearer ...); the default one without a token"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token.strip():
+        workspace = workspaces.authenticate(token.strip())
+        if workspace is None:
+            return jsonify({'error': 'Invalid API token'}), 401
+    else:
+        workspace = workspaces.get(DEFAULT_WORKSPACE)
+    
+    # X-Mandy-Workspace / ?workspace= only confirm which workspace the caller means
+    requested = request.headers.get('X-Mandy-Workspace') or request.args.get('workspace')
+    if requested and requested != workspace.id:
+        return jsonify({'error': 'Not authorized for this workspace'}), 403
+    g.workspace = workspace
+
+
+@bp.after_request
+def record_request_latency(response: Response) -> Response:
+    # Registered before compress_response, so it runs after it and includes it
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_LATENCY.observe(time.perf_counter() - started, route, request.method, response.status_code)
+    return response
+
+
+@bp.teardown_request
+def end_request_span(exc: Optional[BaseException]):
+    # Teardown also runs when a view raises, so the span is always closed
+    request_span = g.pop('request_span', None)
+    if request_span is not None:
+        request_span.__exit__(type(exc) if exc else None, exc, None)
+
+
+def admin_allowed() -> bool:
+    """Admin routes need X-Admin-Token matching MANDY_ADMIN_TOKEN; without that variable they are disabled"""
+    token = os.getenv('MANDY_ADMIN_TOKEN')
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), token.encode())
+
+
+@bp.route('/api/admin/profile', methods=['GET', 'POST', 'DELETE'])
+def admin_profile():
+    """POST ?seconds=N starts spans + sampling, DELETE stops, GET reports status"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.method == 'POST':
+        try:
+            seconds = min(float(request.args.get('seconds', 30)), 600)
+            interval = max(float(request.args.get('interval_ms', 5)), 1) / 1000
+        except ValueError:
+            seconds = interval = float('nan')
+        # Written so NaN fails too
+        if not (seconds > 0 and interval > 0):
+            return jsonify({'error': 'seconds and interval_ms must be positive numbers'}), 400
+        tracing.start(seconds, interval)
+    elif request.method == 'DELETE':
+        tracing.stop()
+    return jsonify(tracing.status())
+
+
+@bp.route('/api/admin/workspaces', methods=['POST'])
+def admin_create_workspace():
+    """Create a workspace; its API token is only returned here"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    workspace_id = (request.json or {}).get('id')
+    try:
+        token = workspaces.create(workspace_id if isinstance(workspace_id, str) else '')
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'workspace': workspace_id, 'token': token}), 201
+
+
+@bp.route('/api/admin/trace.json')
+def admin_trace():
+    """Recorded spans as a Chrome trace"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    response = jsonify(tracing.chrome_trace())
+    response.headers['Content-Disposition'] = 'attachment; filename=mandy-trace.json'
+    return response
+
+
+@bp.route('/api/admin/profile.folded')
+def admin_profile_folded():
+    """Sampled stacks for flamegraph.pl / speedscope"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    return Response(tracing.folded_stacks(), mimetype='text/plain')
+
+
+@bp.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(render_all(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@bp.after_request
+def compress_response(response: Response) -> Response:
+    """ETag + gzip for JSON API responses, so polling clients mostly get 304s or a few KB"""
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+    
+    body = response.get_data()
+    compress = len(body) >= COMPRESS_MIN_BYTES and request.accept_encodings.quality('gzip') > 0
+    response.vary.add('Accept-Encoding')
+    if request.method == 'GET':
+        response.set_etag(hashlib.md5(body).hexdigest() + ('-gzip' if compress else ''))
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+    
+    if compress:
+        response.set_data(gzip.compress(body, 6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+@bp.route('/api/events', defaults={'campaign_id': None})
+@bp.route('/api/campaign/<campaign_id>/events')
+def campaign_events(campaign_id):
+    """Live dispatch events (SSE), for one campaign or all of the workspace's"""
+    workspace_id = g.workspace.id
+    if campaign_id is not None and campaign_id not in g.workspace.campaigns:
+        return jsonify({'error': 'Not found'}), 404
+    
+    last_id = request.headers.get('Last-Event-ID', '')
+    subscription = event_bus.subscribe(campaign_id, int(last_id) if last_id.isdigit() else None)
+    
+    def events():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                batch, dropped = subscription.get(EVENT_KEEPALIVE)
+                if dropped:
+                    # Client fell behind - it should re-read campaign state
+                    yield f"event: dropped\ndata: {json.dumps({'count': dropped})}\n\n"
+                if not batch:
+                    yield ': keep-alive\n\n'
+                for event_id, event, data in batch:
+                    if data.get('workspace') != workspace_id:
+                        continue
+                    yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            subscription.close()
+    
+    return Response(
+        events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@bp.route('/api/campaign/<campaign_id>/pause', methods=['POST'])
 def pause_campaign(campaign_id):
-    if campaign_id not in campaigns:
+    workspace = g.workspace
+    if campaign_id not in workspace.campaigns:
         return jsonify({'error': 'Not found'}), 404
-    campaigns[campaign_id]['status'] = 'paused'
-    for job in scheduler.get_jobs():
+    workspace.campaigns[campaign_id]['status'] = 'paused'
+    for job in scheduler_for(workspace).get_jobs():
         if job.id.startswith(campaign_id):
             job.pause()
+    content_buffer.discard(campaign_id)
     return jsonify({'success': True})
 
 
-def execute_post(campaign_id: str, platform_id: str):
-    """Execute a scheduled post"""
-    if campaign_id not in campaigns:
-        return
-    campaign = campaigns[campaign_id]
-    if campaign['status'] != 'active':
-        return
-    print(f"[MANDY] Posting to {platform_id} for {campaign_id}")
+@bp.route('/api/campaign/<campaign_id>', methods=['DELETE'])
+def delete_campaign(campaign_id):
+    """Stop a campaign for good; its jobs and pre-generated posts go with it"""
+    workspace = g.workspace
+    if campaign_id not in workspace.campaigns:
+        return jsonify({'error': 'Not found'}), 404
+    for job in scheduler_for(workspace).get_jobs():
+        if job.id.startswith(campaign_id):
+            job.remove()
+    content_buffer.discard(campaign_id)
+    del workspace.campaigns[campaign_id]
+    position = bisect.bisect_left(workspace.campaign_index, campaign_id)
+    if position < len(workspace.campaign_index) and workspace.campaign_index[position] == campaign_id:
+        del workspace.campaign_index[position]
+    return jsonify({'success': True})
 
 
+@bp.route('/api/webhooks', methods=['GET'])
+def list_webhooks():
+    return jsonify({'webhooks': webhooks.subscriptions(g.workspace.id)})
 
-# Credentials storage
-CREDS_FILE = Path('./credentials.json')
 
-def load_creds_file():
-    if CREDS_FILE.exists():
+@bp.route('/api/webhooks', methods=['POST'])
+def create_webhook():
+    """Subscribe a URL to post outcomes; the signing secret is only returned here"""
+    data = request.json or {}
+    try:
+        hook = webhooks.subscribe(g.workspace.id, data.get('url') or '', events=data.get('events'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'webhook': hook}), 201
+
+
+@bp.route('/api/webhooks/<webhook_id>', methods=['DELETE'])
+def delete_webhook(webhook_id):
+    if not webhooks.unsubscribe(g.workspace.id, webhook_id):
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify({'success': True})
+
+
+@bp.route('/api/generate/stream', methods=['GET'])
+def stream_generation():
+    """
+    Relay posts for one or more platforms (?platforms=a,b) to the client as they are generated (SSE).
+    Events carry their platform, so a page needs a single stream; generation stops when the client leaves.
+    """
+    requested = request.args.get('platforms') or request.args.get('platform', 'x')
+    platform_ids = [pid for pid in dict.fromkeys(requested.split(',')) if platforms.get(pid)]
+    if not platform_ids:
+        return jsonify({'error': 'Unknown platform'}), 400
+    product_name = request.args.get('name', '')
+    product_description = request.args.get('description', '')
+    style = request.args.get('style', 'professional')
+    agent = get_content_agent()
+    queue = Queue()
+    cancelled = threading.Event()
+    
+    def generate(platform_id):
+        stream = agent.stream_post(platform_id, product_name, product_description, style=style)
+        try:
+            for event, payload in stream:
+                if cancelled.is_set():
+                    break
+                queue.put((platform_id, event, payload))
+        except Exception as e:
+            print(f"[MANDY] Preview for {platform_id} failed: {e}")
+        finally:
+            stream.close()
+            queue.put((platform_id, None, None))
+    
+    def events():
+        futures = [preview_executor.submit(generate, pid) for pid in platform_ids]
+        remaining = len(futures)
         try:
-            with open(CREDS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+            while remaining:
+                try:
+                    platform_id, event, payload = queue.get(timeout=EVENT_KEEPALIVE)
+                except Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if event is None:
+                    remaining -= 1
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(dict(payload, platform=platform_id))}\n\n"
+            yield 'event: end\ndata: {}\n\n'
+        finally:
+            # Also runs when the client disconnects: stop generating for it
+            cancelled.set()
+            for future in futures:
+                future.cancel()
+    
+    return Response(
+        events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def posting_times(platform_id: str, workspace) -> List[str]:
+    """Daily posting times: the account's best hours learned from engagement, else the platform's defaults"""
+    defaults = platforms.schedule(platform_id)['times']
+    learned = []
+    if engagement_store is not None:
+        # Same key execute_post records posts under; never another account's or workspace's data.
+        # Only the cached key: looking it up may need the platform's API, which launch never waits on
+        account = workspace.account_keys.get(platform_id)
+        if account:
+            learned = engagement_store.best_daily_hours(platform_id, workspace.scoped(account), count=len(defaults))
+    # Only switch once there is data for as many slots as the default cadence
+    if len(learned) < len(defaults):
+        return defaults
+    return [f'{hour:02d}:00' for hour in learned]
+
+
+def resolve_account_keys(workspace, platform_ids: Optional[Iterable[str]] = None):
+    """Cache the posting account for each platform the workspace has credentials for (may call the APIs)"""
+    manager = get_platform_manager()
+    for platform_id in platform_ids or platforms.with_status('supported'):
+        try:
+            account = manager.account_key(platform_id, workspace.credential_store.get(platform_id) or None)
+        except Exception as e:
+            print(f"[MANDY] Could not resolve {platform_id} account for {workspace.id}: {e}")
+            continue
+        if account:
+            workspace.account_keys[platform_id] = account
+        else:
+            workspace.account_keys.pop(platform_id, None)
+
+
+def resolve_account_keys_later(workspace):
+    threading.Thread(target=resolve_account_keys, args=(workspace,), name='mandy-accounts', daemon=True).start()
 
-def save_creds_file(creds):
-    with open(CREDS_FILE, 'w') as f:
-        json.dump(creds, f)
 
+def fetch_engagement(platform: str, account: str, post_ids: List[str]) -> Dict:
+    """Counts for one account's posts, using its workspace's credentials"""
+    workspace = workspaces.get(unscoped(account)[0])
+    return get_platform_manager().fetch_engagement(
+        platform, post_ids, credentials=workspace.credential_store.get(platform) or None
+    )
 
-@app.route('/api/credentials', methods=['GET'])
+
+def collect_engagement():
+    """Scheduler job: poll engagement for recently published posts"""
+    if engagement_collector is None:
+        return {}
+    # Workspaces loaded since the last run (or whose lookup failed) get their accounts resolved here
+    for workspace in workspaces:
+        if not workspace.account_keys:
+            resolve_account_keys(workspace)
+    with span('collect_engagement'):
+        return engagement_collector.collect()
+
+
+def refill_buffer(campaign: dict):
+    """Top up pre-generated posts for the next few days in the background"""
+    posts_per_day = {
+        pid: len(platforms.schedule(pid)['times'])
+        for pid in campaign['platforms']
+    }
+    content_buffer.fill(campaign['id'], campaign['product'], posts_per_day, campaign.get('workspace', DEFAULT_WORKSPACE))
+
+
+def publish_event(event: str, campaign_id: str, platform_id: str, workspace_id: str, **data):
+    """Send a dispatch event to stream subscribers and webhooks; never blocks on either"""
+    data.update(campaign_id=campaign_id, platform=platform_id, workspace=workspace_id, at=datetime.now().isoformat())
+    if event_bus is not None:
+        event_bus.publish(event, data, topic=campaign_id)
+    if webhooks is not None:
+        webhooks.enqueue(workspace_id, event, data)
+
+
+def execute_post(campaign_id: str, platform_id: str, workspace_id: str = DEFAULT_WORKSPACE):
+    """Execute a scheduled post"""
+    with span('execute_post', campaign_id=campaign_id, platform=platform_id, workspace=workspace_id):
+        workspace = workspaces.get(workspace_id)
+        if campaign_id not in workspace.campaigns:
+            return
+        campaign = workspace.campaigns[campaign_id]
+        if campaign['status'] != 'active':
+            return
+        
+        # Only read ready content here - never generate on the critical path
+        with span('content_buffer.pop'):
+            post = content_buffer.pop(campaign_id, platform_id)
+        if post is None:
+            from agents import ContentAgent
+            product = campaign['product']
+            post = ContentAgent.mock_post(product.get('name', ''), product.get('description') or product.get('vibe', ''))
+            dedup_scope = workspace.scoped(platform_id)
+            if dedup_index.is_duplicate(dedup_scope, post['content']):
+                refill_buffer(campaign)
+                print(f"[MANDY] Skipping near-duplicate fallback post to {platform_id} for {campaign_id}")
+                POSTS.inc(platform_id, 'duplicate')
+                publish_event('post-failed', campaign_id, platform_id, workspace_id, error='Skipped near-duplicate post')
+                return
+            dedup_index.add(dedup_scope, post['content'])
+        refill_buffer(campaign)
+        
+        print(f"[MANDY] Posting to {platform_id} for {campaign_id}: {post['content'][:80]}")
+        started = time.perf_counter()
+        result = get_platform_manager().post(
+            platform_id,
+            post['content'],
+            credentials=workspace.credential_store.get(platform_id) or None,
+            hashtags=post.get('hashtags', [])
+        )
+        POST_LATENCY.observe(time.perf_counter() - started, platform_id)
+        if result.get('success'):
+            code = 'ok'
+        else:
+            code = 'coming_soon' if result.get('coming_soon') else str(result.get('status_code') or 'error')
+        POSTS.inc(platform_id, code)
+        
+        if result.get('success'):
+            if result.get('account'):
+                workspace.account_keys[platform_id] = result['account']
+            if result.get('post_id'):
+                engagement_store.record_post(platform_id, workspace.scoped(result.get('account', '')), result['post_id'])
+            publish_event('post-sent', campaign_id, platform_id, workspace_id, post_id=result.get('post_id'), url=result.get('url'))
+        elif result.get('status_code') == 429:
+            publish_event('rate-limited', campaign_id, platform_id, workspace_id, error=result.get('error'))
+        else:
+            publish_event('post-failed', campaign_id, platform_id, workspace_id, error=result.get('error'))
+        return result
+
+
+
+# Credentials are per workspace - cached in memory, passed to tools per call (never via os.environ)
+@bp.route('/api/credentials', methods=['GET'])
 def get_credentials():
-    creds = load_creds_file()
-    return jsonify({'credentials': creds})
+    return jsonify({'credentials': g.workspace.credential_store.get()})
 
 
-@app.route('/api/credentials', methods=['POST'])
+@bp.route('/api/credentials', methods=['POST'])
 def save_credentials():
     data = request.json
-    creds = data.get('credentials', {})
-    save_creds_file(creds)
-    
-    # Also set as environment variables for current session
-    for k, v in creds.items():
-        if v:
-            os.environ[k] = v
-    
+    try:
+        g.workspace.credential_store.save(data.get('credentials', {}))
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    # The accounts may have changed; defaults are used until they are looked up again
+    g.workspace.account_keys.clear()
+    resolve_account_keys_later(g.workspace)
     return jsonify({'success': True})
 
 
-@app.route('/api/test-connection', methods=['POST'])
+@bp.route('/api/test-connection', methods=['POST'])
 def test_connection():
     data = request.json
     platform = data.get('platform')
     creds = data.get('credentials', {})
     
-    # Set credentials temporarily
-    for k, v in creds.items():
-        if v:
-            os.environ[k] = v
-    
-    # Coming soon platforms
-    coming_soon = ['instagram', 'linkedin', 'facebook', 'tiktok', 'youtube', 'threads', 'pinterest']
-    if platform in coming_soon:
+    spec = platforms.get(platform)
+    if spec is None or spec['status'] == 'not_planned':
+        return jsonify({'success': False, 'error': 'Unknown platform'})
+    if spec['status'] == 'coming_soon':
         return jsonify({'success': False, 'error': 'Coming soon - awaiting API approval', 'coming_soon': True})
     
+    tool_class = platforms.tool_class(platform)
+    if tool_class is None:
+        return jsonify({'success': False, 'error': 'Unknown platform'})
     try:
-        if platform == 'bluesky':
-            import requests as req
-            resp = req.post(
-                'https://bsky.social/xrpc/com.atproto.server.createSession',
-                json={
-                    'identifier': creds.get('BLUESKY_HANDLE'),
-                    'password': creds.get('BLUESKY_APP_PASSWORD')
-                }
-            )
-            if resp.status_code == 200:
-                data = resp.json()
-                return jsonify({'success': True, 'user': data.get('handle')})
-            return jsonify({'success': False, 'error': resp.json().get('message', 'Auth failed')})
-        
-        elif platform == 'mastodon':
-            import requests as req
-            instance = creds.get('MASTODON_INSTANCE', 'mastodon.social')
-            token = creds.get('MASTODON_ACCESS_TOKEN')
-            resp = req.get(
-                f'https://{instance}/api/v1/accounts/verify_credentials',
-                headers={'Authorization': f'Bearer {token}'}
-            )
-            if resp.status_code == 200:
-                data = resp.json()
-                return jsonify({'success': True, 'user': data.get('username')})
-            return jsonify({'success': False, 'error': 'Invalid token or instance'})
-        
-        elif platform == 'reddit':
-            import praw
-            reddit = praw.Reddit(
-                client_id=creds.get('REDDIT_CLIENT_ID'),
-                client_secret=creds.get('REDDIT_CLIENT_SECRET'),
-                username=creds.get('REDDIT_USERNAME'),
-                password=creds.get('REDDIT_PASSWORD'),
-                user_agent='MarketingMandy/1.0'
-            )
-            user = reddit.user.me()
-            return jsonify({'success': True, 'user': str(user)})
-        
-        else:
-            return jsonify({'success': False, 'error': 'Unknown platform'})
-    
+        tool = tool_class(creds)
+        if tool.authenticate():
+            account = tool.account_key()
+            if account and {k: v for k, v in creds.items() if v} == g.workspace.credential_store.get(platform):
+                g.workspace.account_keys[platform] = account
+            return jsonify({'success': True, 'user': account})
+        return jsonify({'success': False, 'error': 'Authentication failed - check the credentials'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 
-def start_desktop():
+def start_desktop(app: Flask):
     """Start as desktop app"""
     import webview
     webview.create_window('Marketing Mandy', app, width=450, height=700, resizable=True, min_size=(380, 500))
     webview.start()
 
 
+def serve(app: Flask, host: str = '0.0.0.0', port: int = 5000, threads: int = 16, drain_seconds: int = 30):
+    """
+    Run under the waitress production WSGI server with graceful shutdown.
+    Every open SSE stream (campaign events, generation previews) holds one of the
+    threads until it ends, so size threads for those on top of regular requests.
+    """
+    import signal
+    from waitress.server import create_server
+    
+    server = create_server(
+        app,
+        host=host,
+        port=port,
+        threads=threads,
+        connection_limit=int(os.getenv('MANDY_CONNECTION_LIMIT', '200')),
+        max_request_body_size=app.config['MAX_CONTENT_LENGTH'],
+        channel_timeout=120
+    )
+    
+    def stop(signum, frame):
+        raise SystemExit(0)
+    
+    # SIGINT already raises KeyboardInterrupt; both end server.run()
+    signal.signal(signal.SIGTERM, stop)
+    
+    print(f"[MANDY] Serving on http://{host}:{port} with {threads} threads")
+    try:
+        server.run()
+    finally:
+        print("[MANDY] Shutting down: draining in-flight requests and posts")
+        server.close()
+        server.task_dispatcher.shutdown(timeout=drain_seconds)
+        shutdown_services()
+
+
 if __name__ == '__main__':
     import sys
-    if '--web' in sys.argv:
-        port = int(sys.argv[sys.argv.index('--port') + 1]) if '--port' in sys.argv else 5000
+    
+    def arg(flag, default):
+        return sys.argv[sys.argv.index(flag) + 1] if flag in sys.argv else default
+    
+    app = create_app()
+    port = int(arg('--port', 5000))
+    if '--serve' in sys.argv:
+        # Single process: campaign state and the scheduler live in memory,
+        # so concurrency comes from request threads rather than workers
+        serve(
+            app,
+            host=arg('--host', '0.0.0.0'),
+            port=port,
+            threads=int(arg('--threads', os.getenv('MANDY_THREADS', '16'))),
+            drain_seconds=int(arg('--drain-seconds', 30))
+        )
+    elif '--web' in sys.argv:
         app.run(debug=True, port=port, host='0.0.0.0')
     else:
-        start_desktop()
+        start_desktop(app)
@@ -1,6 +1,10 @@
 const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule: {}, campaignId: null };
-        const platforms = {"bluesky":{"icon":"🦋","name":"Bluesky","supported":true},"mastodon":{"icon":"🐘","name":"Mastodon","supported":true},"reddit":{"icon":"🔶","name":"Reddit","supported":true},"instagram":{"icon":"📸","name":"Instagram","supported":false},"linkedin":{"icon":"💼","name":"LinkedIn","supported":false},"facebook":{"icon":"📘","name":"Facebook","supported":false},"tiktok":{"icon":"🎵","name":"TikTok","supported":false},"youtube":{"icon":"📺","name":"YouTube","supported":false},"threads":{"icon":"🧵","name":"Threads","supported":false},"pinterest":{"icon":"📌","name":"Pinterest","supported":false}};
-        const defaultSchedules = {"bluesky":{"times":["09:00","12:00","17:00"]},"mastodon":{"times":["09:00","14:00","19:00"]},"reddit":{"times":["10:00","19:00"]},"instagram":{"times":["11:00","21:00"]},"linkedin":{"times":["07:30","12:00"]},"facebook":{"times":["09:00","13:00","19:00"]},"tiktok":{"times":["12:00","19:00","22:00"]},"youtube":{"times":["15:00"]},"threads":{"times":["09:00","18:00"]},"pinterest":{"times":["14:00","21:00"]}};
+        // Every platform's name, icon, status and default schedule (from the server's platform registry)
+        const platforms = JSON.parse(document.body.dataset.platforms || '{}');
+        // Longest image edge each platform keeps (from the server's platform registry)
+        const imageLimits = JSON.parse(document.body.dataset.imageLimits || '{}');
+        // Images the browser can re-encode smaller; other files are uploaded as picked
+        const SCALABLE = /^image\/(jpeg|png|webp)$/;
         
         document.addEventListener('DOMContentLoaded', function() {
             addMandyMessage("Hey! 👋 I'm Mandy, your marketing sidekick. What are we promoting today?", ["I'm selling t-shirts", "I have a software product", "I run a local business", "Something else"]);
@@ -60,6 +64,7 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
             if (uploadArea) {
                 uploadArea.addEventListener('click', triggerUpload);
             }
+            return msg;
         }
         
         function addUserMessage(text) {
@@ -133,6 +138,7 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
                     showPlatformSelection();
                 } else if (state.stage === 'platforms') {
                     state.stage = 'schedule';
+                    resizeUploads();
                     showSchedulePreview();
                 } else if (state.stage === 'schedule') {
                     state.stage = 'ready';
@@ -145,7 +151,8 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
             let html = '<div class="platform-pills">';
             for (const id in platforms) {
                 const p = platforms[id];
-                var supported = p.supported !== false;
+                if (p.status === 'not_planned') continue;
+                var supported = p.status === 'supported';
                 var pillClass = 'platform-pill' + (supported ? '' : ' coming-soon-pill');
                 var suffix = supported ? '<span class="check">✓</span>' : '<span class="soon-badge">Soon</span>';
                 html += '<div class="' + pillClass + '" data-platform="' + id + '" data-supported="' + supported + '"><span>' + p.icon + '</span><span>' + p.name + '</span>' + suffix + '</div>';
@@ -189,6 +196,7 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
             }
             addUserMessage("Selected: " + state.platforms.map(function(p) { return platforms[p].name; }).join(', '));
             state.stage = 'schedule';
+            resizeUploads();
             showSchedulePreview();
         }
         
@@ -196,7 +204,7 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
             let html = '<div class="schedule-preview">';
             state.platforms.forEach(function(pid) {
                 const p = platforms[pid];
-                const s = defaultSchedules[pid];
+                const s = p.schedule;
                 html += '<div class="schedule-item"><span>' + p.icon + '</span><span>' + p.name + '</span><span class="times">' + s.times.join(' & ') + '</span></div>';
             });
             html += '</div>';
@@ -206,23 +214,61 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
         function showReadyState() {
             addMandyMessage("🎯 Ready!<br><br><b>Product:</b> " + state.product.name + "<br><b>Vibe:</b> " + state.product.vibe + "<br><b>Assets:</b> " + state.assets.length + " files<br><b>Platforms:</b> " + state.platforms.map(function(p) { return platforms[p].icon; }).join(' ') + "<br><br>Hit that green button!");
             document.getElementById('marketBtn').classList.add('visible');
+            streamPreviews(state.platforms);
+        }
+        
+        function streamPreviews(pids) {
+            // One multiplexed stream for every platform; each event says which preview it belongs to
+            const previews = {};
+            pids.forEach(function(pid) {
+                const p = platforms[pid];
+                const msg = addMandyMessage(p.icon + ' <b>' + p.name + ' preview</b><div class="post-preview"></div>');
+                previews[pid] = msg.querySelector('.post-preview');
+            });
+            const chat = document.getElementById('chat');
+            const params = new URLSearchParams({
+                platforms: pids.join(','),
+                name: state.product.name || '',
+                description: state.product.vibe || '',
+                style: state.product.vibe || 'professional'
+            });
+            const source = new EventSource('/api/generate/stream?' + params.toString());
+            source.addEventListener('delta', function(e) {
+                const data = JSON.parse(e.data);
+                previews[data.platform].textContent += data.text;
+                chat.scrollTop = chat.scrollHeight;
+            });
+            source.addEventListener('done', function(e) {
+                const post = JSON.parse(e.data);
+                previews[post.platform].textContent = post.content;
+                previews[post.platform].classList.add('done');
+            });
+            source.addEventListener('end', function() { source.close(); });
+            source.onerror = function() { source.close(); };
         }
         
         function launchCampaign() {
             const btn = document.getElementById('marketBtn');
             btn.textContent = '⏳ Launching...'; 
             btn.disabled = true;
-            fetch('/api/launch', { 
-                method: 'POST', 
-                headers: {'Content-Type': 'application/json'}, 
-                body: JSON.stringify({ product: state.product, assets: state.assets, platforms: state.platforms }) 
+            // Files have been uploading since they were dropped; the launch only carries references
+            Promise.all(state.assets.map(uploadAsset))
+            .then(function(assets) {
+                return fetch('/api/launch', { 
+                    method: 'POST', 
+                    headers: {'Content-Type': 'application/json'}, 
+                    body: JSON.stringify({ product: state.product, assets: assets, platforms: state.platforms }) 
+                });
             })
             .then(function(res) { return res.json(); })
             .then(function(data) {
                 state.campaignId = data.campaign_id;
                 btn.style.display = 'none';
                 addSystemMessage("🎉 Campaign is LIVE!");
-                addMandyMessage("I'm now posting for you! Next post: " + platforms[state.platforms[0]].icon + " at " + defaultSchedules[state.platforms[0]].times[0], ["Show schedule", "Pause campaign"]);
+                const next = data.next_post;
+                const nextText = next ? " Next post: " + platforms[next.platform].icon + " at " + next.run_at.slice(11, 16) : "";
+                addMandyMessage("I'm now posting for you!" + nextText, ["Show schedule", "Pause campaign"]);
+                watchCampaign(data.campaign_id);
             })
             .catch(function(e) { 
                 btn.textContent = '🚀 START MARKETING'; 
@@ -231,6 +277,23 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
             });
         }
         
+        function watchCampaign(campaignId) {
+            const source = new EventSource('/api/campaign/' + encodeURIComponent(campaignId) + '/events');
+            function label(data) { const p = platforms[data.platform]; return p ? p.icon + ' ' + p.name : data.platform; }
+            source.addEventListener('post-sent', function(e) {
+                const data = JSON.parse(e.data);
+                addSystemMessage('✅ Posted to ' + label(data));
+            });
+            source.addEventListener('post-failed', function(e) {
+                const data = JSON.parse(e.data);
+                addSystemMessage('⚠️ ' + label(data) + ' post failed');
+            });
+            source.addEventListener('rate-limited', function(e) {
+                const data = JSON.parse(e.data);
+                addSystemMessage('⏳ ' + label(data) + ' is rate limiting us - will retry next slot');
+            });
+        }
+        
         function triggerUpload() { 
             document.getElementById('fileInput').click(); 
         }
@@ -239,19 +302,18 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
             const container = document.getElementById('uploadedFiles');
             if (!container) return;
             Array.from(e.target.files).forEach(function(file, i) {
-                const reader = new FileReader();
-                reader.onload = function(ev) {
-                    const id = Date.now() + i;
-                    state.assets.push({ id: id, name: file.name, data: ev.target.result });
-                    const thumb = document.createElement('div');
-                    thumb.className = 'uploaded-file';
-                    thumb.innerHTML = '<img src="' + ev.target.result + '"><div class="remove" data-id="' + id + '">✕</div>';
-                    thumb.querySelector('.remove').addEventListener('click', function() {
-                        removeFile(id);
-                    });
-                    container.appendChild(thumb);
-                };
-                reader.readAsDataURL(file);
+                const id = Date.now() + i;
+                const asset = { id: id, name: file.name, file: file, preview: URL.createObjectURL(file), versions: {} };
+                state.assets.push(asset);
+                // Failed uploads are retried on launch
+                uploadAsset(asset).catch(function() {});
+                const thumb = document.createElement('div');
+                thumb.className = 'uploaded-file';
+                thumb.innerHTML = '<img src="' + asset.preview + '"><div class="remove" data-id="' + id + '">✕</div>';
+                thumb.querySelector('.remove').addEventListener('click', function() {
+                    removeFile(id);
+                });
+                container.appendChild(thumb);
             });
             setTimeout(function() { 
                 if (state.assets.length && state.stage === 'assets') {
@@ -261,18 +323,107 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
         }
         
         function removeFile(id) { 
+            state.assets.forEach(function(a) { if (a.id === id) URL.revokeObjectURL(a.preview); });
             state.assets = state.assets.filter(function(a) { return a.id !== id; }); 
             const el = document.querySelector('[data-id="' + id + '"]');
             if (el) el.parentElement.remove();
         }
+        
+        function imageEdges(asset) {
+            // One version per distinct limit of the chosen platforms, never larger than the image itself;
+            // before platforms are picked, the largest edge any selectable platform keeps
+            const ids = state.platforms.length ? state.platforms : Object.keys(platforms).filter(function(id) { return platforms[id].status === 'supported'; });
+            let limits = ids.map(function(id) { return imageLimits[id] || 2048; });
+            if (!state.platforms.length || !SCALABLE.test(asset.file.type)) limits = [Math.max.apply(null, limits.concat(0)) || 2048];
+            const edges = [];
+            limits.forEach(function(limit) {
+                const edge = asset.longEdge ? Math.min(limit, asset.longEdge) : limit;
+                if (edges.indexOf(edge) < 0) edges.push(edge);
+            });
+            return edges.sort(function(a, b) { return b - a; });
+        }
+        
+        function measureImage(asset) {
+            // Long edge of a scalable image, read once
+            if (!asset.measured) {
+                asset.measured = SCALABLE.test(asset.file.type) && window.createImageBitmap
+                    ? createImageBitmap(asset.file, { imageOrientation: 'from-image' }).then(function(bitmap) {
+                        asset.longEdge = Math.max(bitmap.width, bitmap.height);
+                        bitmap.close();
+                    }).catch(function() {})
+                    : Promise.resolve();
+            }
+            return asset.measured;
+        }
+        
+        function scaleImage(asset, maxEdge) {
+            // A smaller JPEG/PNG/WebP when the image is larger than maxEdge, else the file as picked
+            const file = asset.file;
+            if (!SCALABLE.test(file.type) || !window.createImageBitmap) return Promise.resolve(file);
+            return createImageBitmap(file, { imageOrientation: 'from-image' }).then(function(bitmap) {
+                const scale = maxEdge / Math.max(bitmap.width, bitmap.height);
+                if (scale >= 1) {
+                    bitmap.close();
+                    return file;
+                }
+                const canvas = document.createElement('canvas');
+                canvas.width = Math.round(bitmap.width * scale);
+                canvas.height = Math.round(bitmap.height * scale);
+                canvas.getContext('2d').drawImage(bitmap, 0, 0, canvas.width, canvas.height);
+                bitmap.close();
+                return new Promise(function(resolve) {
+                    canvas.toBlob(function(blob) { resolve(blob && blob.size < file.size ? blob : file); }, file.type, 0.9);
+                });
+            }).catch(function() { return file; });
+        }
+        
+        function uploadAsset(asset) {
+            // Upload a version per image limit of the current platform choice in the background;
+            // resolves to the launch reference. Versions no longer needed are dropped (the server expires them)
+            return measureImage(asset).then(function() {
+                const edges = imageEdges(asset);
+                Object.keys(asset.versions).forEach(function(edge) {
+                    if (edges.indexOf(Number(edge)) < 0) delete asset.versions[edge];
+                });
+                return Promise.all(edges.map(function(edge) { return asset.versions[edge] || uploadVersion(asset, edge); }));
+            })
+            .then(function(variants) {
+                return { id: asset.id, name: asset.name, variants: variants };
+            });
+        }
+        
+        function uploadVersion(asset, edge) {
+            // Resolves to the stored reference of the file scaled to edge
+            const upload = scaleImage(asset, edge)
+            .then(function(blob) {
+                return fetch('/api/assets?name=' + encodeURIComponent(asset.name), {
+                    method: 'POST',
+                    headers: {'Content-Type': blob.type || 'application/octet-stream'},
+                    body: blob
+                });
+            })
+            .then(function(res) {
+                if (!res.ok) throw new Error('Upload failed: ' + res.status);
+                return res.json();
+            })
+            .then(function(ref) {
+                ref.max_edge = edge;
+                return ref;
+            });
+            upload.catch(function() { if (asset.versions[edge] === upload) delete asset.versions[edge]; });
+            asset.versions[edge] = upload;
+            return upload;
+        }
+        
+        function resizeUploads() {
+            // Files come before platforms: upload a version for each image limit of the chosen platforms
+            state.assets.forEach(function(a) { uploadAsset(a).catch(function() {}); });
+        }
 
         
-        // Platform credential configs
+        // Credential forms per platform; names, icons and status come from the registry
         const platformCreds = {
             bluesky: {
-                name: 'Bluesky',
-                icon: '🦋',
-                status: 'supported',
                 fields: [
                     { key: 'BLUESKY_HANDLE', label: 'Handle', placeholder: 'yourname.bsky.social' },
                     { key: 'BLUESKY_APP_PASSWORD', label: 'App Password', placeholder: 'xxxx-xxxx-xxxx-xxxx', type: 'password' }
@@ -281,9 +432,6 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
                 helpText: 'Settings → Privacy & Security → App Passwords'
             },
             mastodon: {
-                name: 'Mastodon',
-                icon: '🐘',
-                status: 'supported',
                 fields: [
                     { key: 'MASTODON_INSTANCE', label: 'Instance', placeholder: 'mastodon.social' },
                     { key: 'MASTODON_ACCESS_TOKEN', label: 'Access Token', placeholder: 'Paste your access token', type: 'password' }
@@ -292,9 +440,6 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
                 helpText: 'Settings → Development → New Application'
             },
             reddit: {
-                name: 'Reddit',
-                icon: '🔶',
-                status: 'supported',
                 fields: [
                     { key: 'REDDIT_CLIENT_ID', label: 'Client ID', placeholder: 'Under app name after creation' },
                     { key: 'REDDIT_CLIENT_SECRET', label: 'Client Secret', placeholder: 'secret field' },
@@ -304,62 +449,9 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
                 helpUrl: 'https://www.reddit.com/prefs/apps',
                 helpText: 'Create app → Select "script" type'
             },
-            instagram: {
-                name: 'Instagram',
-                icon: '📸',
-                status: 'coming_soon',
-                fields: [],
-                helpUrl: '#',
-                helpText: 'Coming soon - awaiting Meta API approval'
-            },
-            linkedin: {
-                name: 'LinkedIn',
-                icon: '💼',
-                status: 'coming_soon',
-                fields: [],
-                helpUrl: '#',
-                helpText: 'Coming soon - awaiting API approval'
-            },
-            facebook: {
-                name: 'Facebook',
-                icon: '📘',
-                status: 'coming_soon',
-                fields: [],
-                helpUrl: '#',
-                helpText: 'Coming soon - awaiting Meta API approval'
-            },
-            tiktok: {
-                name: 'TikTok',
-                icon: '🎵',
-                status: 'coming_soon',
-                fields: [],
-                helpUrl: '#',
-                helpText: 'Coming soon - awaiting API approval'
-            },
-            youtube: {
-                name: 'YouTube',
-                icon: '📺',
-                status: 'coming_soon',
-                fields: [],
-                helpUrl: '#',
-                helpText: 'Coming soon - awaiting API approval'
-            },
-            threads: {
-                name: 'Threads',
-                icon: '🧵',
-                status: 'coming_soon',
-                fields: [],
-                helpUrl: '#',
-                helpText: 'Coming soon - awaiting Meta API approval'
-            },
-            pinterest: {
-                name: 'Pinterest',
-                icon: '📌',
-                status: 'coming_soon',
-                fields: [],
-                helpUrl: '#',
-                helpText: 'Coming soon - awaiting API approval'
-            }
+            instagram: { helpText: 'Coming soon - awaiting Meta API approval' },
+            facebook: { helpText: 'Coming soon - awaiting Meta API approval' },
+            threads: { helpText: 'Coming soon - awaiting Meta API approval' }
         };
         
 
@@ -379,8 +471,9 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
             const container = document.getElementById('platformSettings');
             container.innerHTML = '';
             
-            for (const [pid, config] of Object.entries(platformCreds)) {
-                if (config.status === 'removed') continue;
+            for (const pid in platforms) {
+                if (platforms[pid].status === 'not_planned') continue;
+                const config = Object.assign({ fields: [], helpUrl: '#', helpText: 'Coming soon - awaiting API approval' }, platformCreds[pid], platforms[pid]);
                 
                 const isComingSoon = config.status === 'coming_soon';
                 const isConnected = !isComingSoon && checkPlatformConnected(pid);
@@ -438,8 +531,8 @@ const state = { stage: 'intro', product: {}, assets: [], platforms: [], schedule
         }
         
         function checkPlatformConnected(pid) {
-            const config = platformCreds[pid];
-            return config.fields.every(function(f) { 
+            const fields = (platformCreds[pid] || {}).fields || [];
+            return fields.length > 0 && fields.every(function(f) { 
                 return savedCredentials[f.key] && savedCredentials[f.key].length > 0; 
             });
         }
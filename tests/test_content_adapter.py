@@ -0,0 +1,111 @@
+"""
+Tests for the deterministic content adapter
+"""
+import pytest
+
+from tools.content_adapter import ELLIPSIS, adapt_all, adapt_text, count_graphemes, measure, split_thread
+
+
+@pytest.mark.parametrize('max_len, expected', [(-5, ''), (0, ''), (1, ELLIPSIS)])
+def test_adapt_text_tiny_budgets(max_len, expected):
+    assert adapt_text('abc', max_len) == expected
+
+
+def test_adapt_text_two_chars_keeps_one_grapheme():
+    assert adapt_text('abc', 2) == 'a' + ELLIPSIS
+
+
+def test_adapt_text_fits_unchanged():
+    assert adapt_text('  short post  ', 20) == 'short post'
+
+
+def test_adapt_text_never_exceeds_budget():
+    text = 'The quick brown fox jumps over the lazy dog near the riverbank today'
+    for max_len in range(0, len(text) + 2):
+        assert count_graphemes(adapt_text(text, max_len)) <= max_len
+
+
+def test_adapt_text_cuts_on_word_boundary():
+    result = adapt_text('alpha beta gamma delta', 13)
+    assert result == 'alpha beta' + ELLIPSIS
+
+
+def test_adapt_text_prefers_sentence_end():
+    result = adapt_text('First sentence here. Second one is longer', 24)
+    assert result == 'First sentence here.'
+
+
+def test_adapt_text_drops_whole_hashtags_before_cutting_text():
+    text = 'New release out now #launch #python #opensource'
+    result = adapt_text(text, 29)
+    assert result == 'New release out now #launch'
+
+
+def test_adapt_text_drops_all_hashtags_when_none_fit():
+    text = 'New release out now #averyveryverylonghashtag'
+    assert adapt_text(text, 22) == 'New release out now'
+
+
+def test_adapt_text_counts_urls_at_platform_length():
+    url = 'https://example.com/' + 'x' * 60
+    text = f'Read this {url}'
+    assert adapt_text(text, 40, url_length=23) == text
+    assert measure(text, 23) == 33
+
+
+def test_adapt_text_keeps_emoji_whole():
+    text = 'Go 👩🏽‍💻👩🏽‍💻👩🏽‍💻'
+    result = adapt_text(text, 4)
+    assert count_graphemes(result) <= 4
+    assert '‍' not in result[-2:]
+
+
+def test_split_thread_fits_in_one_post():
+    assert split_thread('hello world', 20) == ['hello world']
+
+
+def test_split_thread_posts_fit_with_counter():
+    text = ' '.join(['word'] * 60)
+    posts = split_thread(text, 30)
+    assert len(posts) > 1
+    for i, post in enumerate(posts, 1):
+        assert post.endswith(f' {i}/{len(posts)}')
+        assert count_graphemes(post) <= 30
+
+
+def test_split_thread_recomputes_reserve_for_two_digit_counts():
+    text = ' '.join(['ab'] * 40)
+    posts = split_thread(text, 12)
+    assert len(posts) >= 10
+    assert all(count_graphemes(post) <= 12 for post in posts)
+
+
+def test_split_thread_reserve_matches_counter_width():
+    # With a single-digit count the counter takes 4 characters, not a fixed 6
+    posts = split_thread('aaaaa bbbbb ccccc', 9)
+    assert posts == ['aaaaa 1/3', 'bbbbb 2/3', 'ccccc 3/3']
+
+
+def test_split_thread_without_room_for_counter():
+    posts = split_thread('abcdefgh', 3)
+    assert posts == ['abc', 'def', 'gh']
+
+
+def test_split_thread_zero_budget():
+    assert split_thread('abc', 0) == []
+
+
+def test_split_thread_unnumbered():
+    assert split_thread('aaa bbb ccc', 7, numbered=False) == ['aaa bbb', 'ccc']
+
+
+def test_split_thread_breaks_overlong_token():
+    posts = split_thread('x' * 25, 10, numbered=False)
+    assert posts == ['x' * 10, 'x' * 10, 'x' * 5]
+
+
+def test_adapt_all_per_platform_limits():
+    text = 'Big news https://example.com/' + 'p' * 40 + ' today'
+    adapted = adapt_all(text, {'x': 40, 'bluesky': 40})
+    assert adapted['x'] == text
+    assert count_graphemes(adapted['bluesky']) <= 40
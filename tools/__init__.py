@@ -1,3 +1,26 @@
-from .platform_tools import PlatformManager, BasePlatformTool
+import importlib
 
-__all__ = ['PlatformManager', 'BasePlatformTool']
+# Imported on first access: the platform tools pull in requests
+_EXPORTS = {
+    'PlatformManager': '.platform_tools',
+    'BasePlatformTool': '.platform_tools',
+    'adapt_text': '.content_adapter',
+    'split_thread': '.content_adapter',
+    'NearDuplicateIndex': '.dedup_index',
+    'CredentialStore': '.credential_store',
+    'EventBus': '.event_bus',
+    'EngagementStore': '.engagement',
+    'EngagementCollector': '.engagement',
+    'WorkspaceRouter': '.workspaces',
+    'WebhookDispatcher': '.webhooks'
+}
+
+__all__ = ['PlatformManager', 'BasePlatformTool', 'adapt_text', 'split_thread', 'NearDuplicateIndex', 'CredentialStore', 'EventBus',
+           'EngagementStore', 'EngagementCollector', 'WorkspaceRouter', 'WebhookDispatcher']
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        module = importlib.import_module(_EXPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,201 @@
+"""
+Content Adapter - Deterministic re-flow of one post into each platform's limits
+No LLM calls: counts graphemes, applies platform URL rules and cuts on
+sentence, hashtag and word boundaries (or splits into a numbered thread).
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import regex as _regex
+    _GRAPHEME = _regex.compile(r'\X')
+except ImportError:
+    # Close approximation of extended grapheme clusters: a base character plus
+    # combining marks, variation selectors, skin tones, tags, keycaps and
+    # ZWJ-joined emoji; regional indicators pair up into flags
+    _EXTEND = (
+        '\u0300-\u036f\u0483-\u0489\u0591-\u05bd\u0610-\u061a\u064b-\u065f'
+        '\u0900-\u0903\u093a-\u094f\u0e31\u0e34-\u0e3a\u0e47-\u0e4e'
+        '\u1ab0-\u1aff\u1dc0-\u1dff\u200c\u20d0-\u20ff\ufe00-\ufe0f\ufe20-\ufe2f'
+        '\U0001f3fb-\U0001f3ff\U000e0020-\U000e007f'
+    )
+    _GRAPHEME = re.compile(
+        '\r\n|[\U0001f1e6-\U0001f1ff]{2}'
+        '|.[%s]*(?:\u200d.[%s]*)*' % (_EXTEND, _EXTEND),
+        re.DOTALL
+    )
+
+URL_PATTERN = re.compile(r'^(?:https?://|www\.)\S+$', re.IGNORECASE)
+SENTENCE_END = re.compile(r'[.!?…]["\')\]]*$')
+ELLIPSIS = '…'
+# A sentence end is only worth cutting at if it keeps this share of the budget
+MIN_SENTENCE_FILL = 0.6
+
+# Platforms that count every link as a fixed length regardless of its text
+URL_LENGTHS = {
+    'x': 23,
+    'mastodon': 23,
+}
+
+
+def count_graphemes(text: str) -> int:
+    """Number of user-perceived characters in text"""
+    if text.isascii():
+        return len(text) - text.count('\r\n')
+    return len(_GRAPHEME.findall(text))
+
+
+def _split(text: str, url_length: Optional[int]) -> Tuple[List[str], List[int]]:
+    """Split into alternating word/whitespace pieces with their measured lengths"""
+    pieces = re.findall(r'\S+|\s+', text)
+    lengths = []
+    for piece in pieces:
+        if url_length is not None and URL_PATTERN.match(piece):
+            lengths.append(url_length)
+        else:
+            lengths.append(count_graphemes(piece))
+    return pieces, lengths
+
+
+def measure(text: str, url_length: Optional[int] = None) -> int:
+    """Length of text as the platform counts it"""
+    if url_length is None:
+        return count_graphemes(text)
+    return sum(_split(text, url_length)[1])
+
+
+def _best_cut(pieces: List[str], lengths: List[int], start: int, budget: int) -> Tuple[int, bool]:
+    """
+    Furthest piece index (exclusive) from start that fits in budget.
+    Prefers the last sentence end if it fills MIN_SENTENCE_FILL of the budget;
+    otherwise the last whole word.
+    Returns (end, at_sentence); end == start means not even one word fits.
+    """
+    used = 0
+    last_word = start
+    last_sentence = start
+    sentence_used = 0
+    for i in range(start, len(pieces)):
+        used += lengths[i]
+        if used > budget:
+            break
+        if not pieces[i].isspace():
+            last_word = i + 1
+            if SENTENCE_END.search(pieces[i]):
+                last_sentence = i + 1
+                sentence_used = used
+    if last_sentence > start and sentence_used >= budget * MIN_SENTENCE_FILL:
+        return last_sentence, True
+    return last_word, False
+
+
+def _cut_graphemes(text: str, budget: int) -> str:
+    if text.isascii():
+        return text[:budget]
+    return ''.join(_GRAPHEME.findall(text)[:budget])
+
+
+def adapt_text(text: str, max_len: int, url_length: Optional[int] = None) -> str:
+    """Shorten text to max_len without breaking words, links, hashtags or emoji"""
+    text = text.strip()
+    pieces, lengths = _split(text, url_length)
+    return _reflow(text, pieces, lengths, max_len)
+
+
+def _reflow(text: str, pieces: List[str], lengths: List[int], max_len: int) -> str:
+    if sum(lengths) <= max_len:
+        return text
+    if max_len <= 1:
+        return ELLIPSIS if max_len == 1 else ''
+
+    # Trailing hashtag block is kept separate so it can be re-added if room remains
+    tag_start = len(pieces)
+    while tag_start > 0 and (pieces[tag_start - 1].isspace() or pieces[tag_start - 1].startswith('#')):
+        tag_start -= 1
+    tags = [(p, n) for p, n in zip(pieces[tag_start:], lengths[tag_start:]) if not p.isspace()]
+    if tag_start == 0:
+        tags = []
+        tag_start = len(pieces)
+
+    # Whole hashtags go before anything is cut out of the text itself
+    if sum(lengths[:tag_start]) <= max_len:
+        return _with_tags(''.join(pieces[:tag_start]).rstrip(), max_len - sum(lengths[:tag_start]), tags)
+
+    end, at_sentence = _best_cut(pieces[:tag_start], lengths[:tag_start], 0, max_len)
+    if at_sentence:
+        return _with_tags(''.join(pieces[:end]), max_len - sum(lengths[:end]), tags)
+
+    end, _ = _best_cut(pieces[:tag_start], lengths[:tag_start], 0, max_len - 1)
+    if end == 0:
+        return _cut_graphemes(pieces[0], max_len - 1) + ELLIPSIS
+    return ''.join(pieces[:end]).rstrip(',;:-–—') + ELLIPSIS
+
+
+def _with_tags(result: str, remaining: int, tags: List[Tuple[str, int]]) -> str:
+    """Append as many whole hashtags as fit in remaining"""
+    for tag, n in tags:
+        if n + 1 <= remaining:
+            result += ' ' + tag
+            remaining -= n + 1
+    return result
+
+
+def _split_posts(pieces: List[str], lengths: List[int], budget: int) -> List[str]:
+    pieces, lengths = list(pieces), list(lengths)
+    posts = []
+    start = 0
+    while start < len(pieces):
+        if pieces[start].isspace():
+            start += 1
+            continue
+        end, _ = _best_cut(pieces, lengths, start, budget)
+        if end == start:
+            # Single token longer than a whole post
+            head = _cut_graphemes(pieces[start], budget)
+            pieces[start] = pieces[start][len(head):]
+            lengths[start] = count_graphemes(pieces[start])
+            posts.append(head)
+            continue
+        posts.append(''.join(pieces[start:end]).strip())
+        start = end
+    return posts
+
+
+def split_thread(text: str, max_len: int, url_length: Optional[int] = None, numbered: bool = True) -> List[str]:
+    """Split text into a thread of posts that each fit max_len"""
+    text = text.strip()
+    pieces, lengths = _split(text, url_length)
+    if sum(lengths) <= max_len:
+        return [text]
+    if max_len < 1:
+        return []
+
+    # Room for the " n/n" counter on every post; split again if the count gains a digit
+    count = 2
+    while True:
+        reserve = len(f' {count}/{count}') if numbered else 0
+        if reserve >= max_len:
+            # No room for a counter at all
+            numbered, reserve = False, 0
+        posts = _split_posts(pieces, lengths, max_len - reserve)
+        if not numbered or len(f' {len(posts)}/{len(posts)}') <= reserve:
+            break
+        count = len(posts)
+
+    if numbered and len(posts) > 1:
+        posts = [f"{post} {i}/{len(posts)}" for i, post in enumerate(posts, 1)]
+    return posts
+
+
+def adapt_all(text: str, limits: Dict[str, int]) -> Dict[str, str]:
+    """Re-flow one master post into every platform in limits ({platform: max_len})"""
+    text = text.strip()
+    splits = {}
+    adapted = {}
+    for platform, max_len in limits.items():
+        url_length = URL_LENGTHS.get(platform)
+        if url_length not in splits:
+            splits[url_length] = _split(text, url_length)
+        pieces, lengths = splits[url_length]
+        adapted[platform] = _reflow(text, pieces, lengths, max_len)
+    return adapted
@@ -0,0 +1,222 @@
+"""
+Credential Store - In-memory cache over credentials.json with atomic writes
+Reads cost one stat() call; the file is only re-parsed when it changes on disk.
+
+The file is an encrypted vault: one AES-GCM entry per platform, so a single
+platform can be decrypted without touching the others. With
+MANDY_VAULT_PASSPHRASE set the key is derived with scrypt, once per process.
+Without it a random key is generated on first save into the user's config
+directory ($MANDY_KEY_DIR, else $XDG_CONFIG_HOME/mandy/keys/, mode 0600), one
+file per vault path - away from the vault, so copying or backing up the app
+directory does not take the key along. It does not protect a machine whose
+files can all be read. Keys that older versions wrote next to the vault
+(<name>.key) are still used. Plaintext files from older versions are still
+read and are encrypted on the next save.
+"""
+import os
+import json
+import base64
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+VAULT_VERSION = 1
+SCRYPT_PARAMS = {'n': 2 ** 15, 'r': 8, 'p': 1}
+
+# Derived keys by (passphrase digest, salt, params) - scrypt is deliberately slow
+_KEY_CACHE: Dict[Tuple, bytes] = {}
+_KEY_LOCK = threading.Lock()
+
+
+def platform_of(key: str) -> str:
+    """Vault entry a credential belongs to, e.g. MASTODON_ACCESS_TOKEN -> mastodon"""
+    return key.split('_', 1)[0].lower()
+
+
+def key_dir() -> Path:
+    """Directory for generated vault keys, outside any vault's directory"""
+    if os.getenv('MANDY_KEY_DIR'):
+        return Path(os.environ['MANDY_KEY_DIR'])
+    config_home = os.getenv('XDG_CONFIG_HOME') or Path.home() / '.config'
+    return Path(config_home) / 'mandy' / 'keys'
+
+
+def default_key_path(vault_path: Path) -> Path:
+    """Keyfile for one vault, named after the vault's absolute path"""
+    digest = hashlib.sha256(str(vault_path.resolve()).encode()).hexdigest()[:16]
+    return key_dir() / f'{vault_path.stem}-{digest}.key'
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def derive_key(passphrase: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    """scrypt key for the vault, computed at most once per process"""
+    cache_key = (hashlib.sha256(passphrase.encode()).digest(), salt, n, r, p)
+    with _KEY_LOCK:
+        key = _KEY_CACHE.get(cache_key)
+        if key is None:
+            key = _KEY_CACHE[cache_key] = hashlib.scrypt(
+                passphrase.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=32
+            )
+    return key
+
+
+def _cipher(key: bytes):
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError:
+        raise RuntimeError("The credential vault needs the 'cryptography' package")
+    return AESGCM(key)
+
+
+class CredentialStore:
+    """Thread-safe credential cache, invalidated by the file's mtime and size"""
+
+    def __init__(self, path, passphrase: Optional[str] = None, key_path=None):
+        self.path = Path(path)
+        self.passphrase = passphrase if passphrase is not None else os.getenv('MANDY_VAULT_PASSPHRASE')
+        self.key_path = Path(key_path) if key_path is not None else default_key_path(self.path)
+        # Where versions before the key moved out of the app directory wrote it
+        self.legacy_key_path = self.path.with_name(f'{self.path.stem}.key')
+        self._file_key: Optional[bytes] = None
+        self._key_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._doc: Dict = {}
+        self._stamp: Optional[Tuple[int, int]] = None
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read {self.path}: {e}")
+            return {}
+
+    def _document(self) -> Dict:
+        stamp = self._file_stamp()
+        with self._lock:
+            if stamp != self._stamp:
+                self._doc = self._read()
+                self._stamp = stamp
+            return self._doc
+
+    def _key_from_file(self, create: bool = False) -> bytes:
+        """The generated vault key, read once; created (0600, never overwritten) when asked to"""
+        with self._key_lock:
+            return self._load_file_key(create)
+
+    def _load_file_key(self, create: bool) -> bytes:
+        if self._file_key is None:
+            for path in (self.key_path, self.legacy_key_path):
+                try:
+                    with open(path, 'rb') as f:
+                        self._file_key = base64.b64decode(f.read())
+                    break
+                except FileNotFoundError:
+                    continue
+            else:
+                if not create:
+                    raise RuntimeError(f'Credentials are encrypted but {self.key_path} is missing')
+                key = os.urandom(32)
+                self.key_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+                fd = os.open(self.key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(base64.b64encode(key))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._file_key = key
+        return self._file_key
+
+    def _vault_key(self, kdf: Dict, create: bool = False) -> bytes:
+        if kdf.get('name') == 'keyfile':
+            return self._key_from_file(create)
+        if not self.passphrase:
+            raise RuntimeError('Credentials are encrypted - set MANDY_VAULT_PASSPHRASE')
+        return derive_key(self.passphrase, base64.b64decode(kdf['salt']), kdf['n'], kdf['r'], kdf['p'])
+
+    def get(self, platform: Optional[str] = None) -> Dict[str, str]:
+        """Current credentials, optionally for one platform only; always a fresh dict"""
+        doc = self._document()
+        if 'vault' not in doc:
+            return {k: v for k, v in doc.items() if platform is None or platform_of(k) == platform}
+
+        entries = doc['entries']
+        names = list(entries) if platform is None else [platform]
+        creds = {}
+        try:
+            cipher = _cipher(self._vault_key(doc['kdf']))
+        except RuntimeError as e:
+            logger.error(str(e))
+            return creds
+        for name in names:
+            if name not in entries:
+                continue
+            try:
+                entry = entries[name]
+                plaintext = cipher.decrypt(base64.b64decode(entry['nonce']), base64.b64decode(entry['data']), name.encode())
+                creds.update(json.loads(plaintext))
+            except Exception:
+                logger.error(f"Could not decrypt {name} credentials - wrong passphrase or corrupted vault")
+        return creds
+
+    def _encrypt(self, creds: Dict[str, str]) -> Dict:
+        kdf = self._document().get('kdf')
+        if self.passphrase:
+            if not kdf or kdf.get('name') != 'scrypt' or any(kdf.get(k) != v for k, v in SCRYPT_PARAMS.items()):
+                # Keep the salt across saves so the cached key stays valid
+                kdf = {'name': 'scrypt', 'salt': _b64(os.urandom(16)), **SCRYPT_PARAMS}
+        elif kdf and kdf.get('name') != 'keyfile':
+            # Never downgrade a passphrase vault because the variable is missing
+            raise RuntimeError('Credentials are encrypted with a passphrase - set MANDY_VAULT_PASSPHRASE to save')
+        else:
+            kdf = {'name': 'keyfile'}
+        cipher = _cipher(self._vault_key(kdf, create=True))
+
+        grouped: Dict[str, Dict[str, str]] = {}
+        for k, v in creds.items():
+            grouped.setdefault(platform_of(k), {})[k] = v
+
+        entries = {}
+        for name, values in grouped.items():
+            nonce = os.urandom(12)
+            data = cipher.encrypt(nonce, json.dumps(values).encode(), name.encode())
+            entries[name] = {'nonce': _b64(nonce), 'data': _b64(data)}
+        return {'vault': VAULT_VERSION, 'kdf': kdf, 'entries': entries}
+
+    def save(self, creds: Dict[str, str]):
+        """Encrypt and replace the stored credentials atomically (temp file + rename, mode 0600);
+        raises RuntimeError rather than ever writing them in plaintext"""
+        creds = {k: v for k, v in creds.items() if v}
+        doc = self._encrypt(creds)
+
+        directory = self.path.parent
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(prefix='.credentials-', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(doc, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._doc = doc
+            self._stamp = self._file_stamp()
@@ -0,0 +1,136 @@
+"""
+Near-Duplicate Index - MinHash/LSH over posted and queued content, per scope
+A scope is whatever posts are compared within: the platform id, or
+workspace/platform for other workspaces (stored in the 'account' column).
+Lookups hit an indexed band table and compare at most max_candidates stored
+signatures, the ones sharing the most bands, so cost stays flat as history
+grows. Computing a signature costs about a millisecond for a 50-word post.
+"""
+import re
+import random
+import sqlite3
+import struct
+import threading
+import zlib
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+_MERSENNE = (1 << 61) - 1
+_WORD = re.compile(r'[\w#@]+')
+
+
+class NearDuplicateIndex:
+    """Finds previously seen posts whose estimated Jaccard similarity exceeds a threshold"""
+
+    SCHEMA = (
+        '''CREATE TABLE IF NOT EXISTS mandy_dedup_posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account TEXT NOT NULL,
+            signature BLOB NOT NULL,
+            created_at TEXT NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS mandy_dedup_bands (
+            account TEXT NOT NULL,
+            band INTEGER NOT NULL,
+            post_id INTEGER NOT NULL,
+            PRIMARY KEY (account, band, post_id)
+        ) WITHOUT ROWID''',
+    )
+
+    def __init__(
+        self,
+        db_path: str,
+        threshold: float = 0.7,
+        num_perm: int = 64,
+        bands: int = 16,
+        max_candidates: int = 64
+    ):
+        if num_perm % bands:
+            raise ValueError('num_perm must be divisible by bands')
+        self.threshold = threshold
+        # Templated posts can share bands with thousands of others; compare the closest only
+        self.max_candidates = max_candidates
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._packer = struct.Struct(f'<{num_perm}Q')
+
+        # Fixed seed: stored signatures must stay comparable across restarts
+        rng = random.Random(0x4D414E4459)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE), rng.randrange(0, _MERSENNE))
+            for _ in range(num_perm)
+        ]
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+
+    def _shingles(self, text: str) -> set:
+        words = _WORD.findall(text.lower())
+        if len(words) < 2:
+            return {zlib.crc32(w.encode()) for w in words} or {0}
+        return {zlib.crc32(f'{a} {b}'.encode()) for a, b in zip(words, words[1:])}
+
+    def signature(self, text: str) -> List[int]:
+        """MinHash signature of text's word bigrams"""
+        hashes = self._shingles(text)
+        return [min((a * h + b) % _MERSENNE for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, signature: List[int]) -> List[int]:
+        packed = self._packer.pack(*signature)
+        width = self.rows * 8
+        return [
+            (i << 32) | zlib.crc32(packed[i * width:(i + 1) * width])
+            for i in range(self.bands)
+        ]
+
+    def similarity(self, sig_a: List[int], sig_b: List[int]) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / self.num_perm
+
+    def find_similar(self, scope: str, text: str, threshold: Optional[float] = None) -> Optional[Tuple[int, float]]:
+        """Best (post_id, similarity) at or above threshold among scope's posts, or None"""
+        threshold = self.threshold if threshold is None else threshold
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+
+        placeholders = ','.join('?' * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f'''SELECT p.id, p.signature FROM mandy_dedup_posts p
+                    JOIN (
+                        SELECT post_id, COUNT(*) AS hits FROM mandy_dedup_bands
+                        WHERE account = ? AND band IN ({placeholders})
+                        GROUP BY post_id ORDER BY hits DESC, post_id DESC LIMIT ?
+                    ) c ON c.post_id = p.id''',
+                [scope, *keys, self.max_candidates]
+            ).fetchall()
+
+        best = None
+        for post_id, blob in rows:
+            score = self.similarity(signature, self._packer.unpack(blob))
+            if score >= threshold and (best is None or score > best[1]):
+                best = (post_id, score)
+        return best
+
+    def is_duplicate(self, scope: str, text: str) -> bool:
+        return self.find_similar(scope, text) is not None
+
+    def add(self, scope: str, text: str) -> int:
+        """Record text as posted or queued within scope"""
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO mandy_dedup_posts (account, signature, created_at) VALUES (?, ?, ?)',
+                (scope, self._packer.pack(*signature), datetime.now().isoformat())
+            )
+            post_id = cursor.lastrowid
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO mandy_dedup_bands (account, band, post_id) VALUES (?, ?, ?)',
+                [(scope, key, post_id) for key in keys]
+            )
+        return post_id
@@ -0,0 +1,210 @@
+"""
+Engagement - Learns each account's best posting slots from how its posts performed
+Published posts are re-polled in bulk for likes/reposts/replies while they are
+fresh; every change is added to an hour-of-week bucket, so slot rankings are
+maintained incrementally instead of rescanning post history.
+"""
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+from . import platforms
+
+logger = logging.getLogger(__name__)
+
+# Replies and reposts say more about reach than a like
+WEIGHTS = {'likes': 1, 'reposts': 2, 'replies': 3}
+# Re-poll young posts often and older ones rarely: (max age, interval)
+POLL_INTERVALS = ((timedelta(days=1), timedelta(hours=1)), (timedelta(days=3), timedelta(hours=6)))
+SLOW_POLL_INTERVAL = timedelta(hours=24)
+
+
+def slot_of(when: datetime) -> int:
+    """Hour of the week, Monday 00:00 = 0"""
+    return when.weekday() * 24 + when.hour
+
+
+def score_of(counts: Dict[str, int]) -> int:
+    return sum(WEIGHTS[k] * int(counts.get(k) or 0) for k in WEIGHTS)
+
+
+class RateLimited(Exception):
+    """Raised by fetch_engagement when a platform asks us to back off"""
+
+    def __init__(self, retry_after: float = 300):
+        super().__init__(f'rate limited for {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+class EngagementStore:
+    """Per-post engagement counts plus per-account hour-of-week aggregates"""
+
+    SCHEMA = (
+        '''CREATE TABLE IF NOT EXISTS mandy_engagement_posts (
+            platform TEXT NOT NULL,
+            post_id TEXT NOT NULL,
+            account TEXT NOT NULL,
+            slot INTEGER NOT NULL,
+            posted_at REAL NOT NULL,
+            checked_at REAL,
+            score INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (platform, post_id)
+        ) WITHOUT ROWID''',
+        '''CREATE INDEX IF NOT EXISTS ix_mandy_engagement_due
+            ON mandy_engagement_posts (platform, posted_at)''',
+        '''CREATE TABLE IF NOT EXISTS mandy_engagement_slots (
+            platform TEXT NOT NULL,
+            account TEXT NOT NULL,
+            slot INTEGER NOT NULL,
+            posts INTEGER NOT NULL DEFAULT 0,
+            score INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (platform, account, slot)
+        ) WITHOUT ROWID''',
+    )
+
+    def __init__(self, db_path: str, track_days: int = 7, min_posts: int = 3):
+        self.track_days = track_days
+        self.min_posts = min_posts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+
+    def record_post(self, platform: str, account: str, post_id: str, posted_at: Optional[datetime] = None):
+        """Start tracking a post we just published"""
+        posted_at = posted_at or datetime.now()
+        slot = slot_of(posted_at)
+        with self._lock, self._conn:
+            inserted = self._conn.execute(
+                '''INSERT OR IGNORE INTO mandy_engagement_posts (platform, post_id, account, slot, posted_at)
+                   VALUES (?, ?, ?, ?, ?)''',
+                (platform, str(post_id), account or '', slot, posted_at.timestamp())
+            ).rowcount
+            if inserted:
+                self._conn.execute(
+                    '''INSERT INTO mandy_engagement_slots (platform, account, slot, posts) VALUES (?, ?, ?, 1)
+                       ON CONFLICT (platform, account, slot) DO UPDATE SET posts = posts + 1''',
+                    (platform, account or '', slot)
+                )
+
+    def due_posts(self, platform: str, limit: int = 200, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """(post id, account) of tracked posts whose age-based poll interval has elapsed, stalest first"""
+        now = now or time.time()
+        oldest = now - timedelta(days=self.track_days).total_seconds()
+        with self._lock:
+            rows = self._conn.execute(
+                '''SELECT post_id, account, posted_at, checked_at FROM mandy_engagement_posts
+                   WHERE platform = ? AND posted_at >= ? AND (checked_at IS NULL OR checked_at <= ?)
+                   ORDER BY COALESCE(checked_at, 0)''',
+                (platform, oldest, now - POLL_INTERVALS[0][1].total_seconds())
+            ).fetchall()
+
+        due = []
+        for post_id, account, posted_at, checked_at in rows:
+            age = timedelta(seconds=now - posted_at)
+            interval = next((every for max_age, every in POLL_INTERVALS if age < max_age), SLOW_POLL_INTERVAL)
+            if checked_at is None or now - checked_at >= interval.total_seconds():
+                due.append((post_id, account))
+                if len(due) >= limit:
+                    break
+        return due
+
+    def update_counts(self, platform: str, post_ids: List[str], counts: Dict[str, Dict[str, int]]) -> int:
+        """Apply fresh counts; only the change in each post's score touches its slot"""
+        now = time.time()
+        changed = 0
+        with self._lock, self._conn:
+            for post_id in post_ids:
+                row = self._conn.execute(
+                    'SELECT account, slot, score FROM mandy_engagement_posts WHERE platform = ? AND post_id = ?',
+                    (platform, post_id)
+                ).fetchone()
+                if row is None:
+                    continue
+                account, slot, old_score = row
+                # Deleted or unavailable posts keep their last score
+                new_score = score_of(counts[post_id]) if post_id in counts else old_score
+                self._conn.execute(
+                    'UPDATE mandy_engagement_posts SET score = ?, checked_at = ? WHERE platform = ? AND post_id = ?',
+                    (new_score, now, platform, post_id)
+                )
+                if new_score != old_score:
+                    changed += 1
+                    self._conn.execute(
+                        'UPDATE mandy_engagement_slots SET score = score + ? WHERE platform = ? AND account = ? AND slot = ?',
+                        (new_score - old_score, platform, account, slot)
+                    )
+        return changed
+
+    def best_slots(self, platform: str, account: Optional[str] = None, count: int = 3) -> List[int]:
+        """Hour-of-week slots with the highest average engagement for one account
+        (every account on the platform when account is None)"""
+        condition, params = ('AND account = ?', (platform, account)) if account is not None else ('', (platform,))
+        with self._lock:
+            rows = self._conn.execute(
+                f'''SELECT slot, SUM(score) * 1.0 / SUM(posts) AS average FROM mandy_engagement_slots
+                    WHERE platform = ? {condition} GROUP BY slot HAVING SUM(posts) >= ?
+                    ORDER BY average DESC LIMIT ?''',
+                (*params, self.min_posts, count)
+            ).fetchall()
+        return [slot for slot, _ in rows]
+
+    def best_daily_hours(self, platform: str, account: Optional[str] = None, count: int = 2) -> List[int]:
+        """Hours of the day with the highest average engagement across weekdays"""
+        condition, params = ('AND account = ?', (platform, account)) if account is not None else ('', (platform,))
+        with self._lock:
+            rows = self._conn.execute(
+                f'''SELECT slot % 24 AS hour, SUM(score) * 1.0 / SUM(posts) AS average FROM mandy_engagement_slots
+                    WHERE platform = ? {condition} GROUP BY hour HAVING SUM(posts) >= ?
+                    ORDER BY average DESC LIMIT ?''',
+                (*params, self.min_posts, count)
+            ).fetchall()
+        return sorted(hour for hour, _ in rows)
+
+    def next_best_time(self, platform: str, account: Optional[str] = None, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Soonest upcoming occurrence of one of the best learned slots, or None"""
+        slots = self.best_slots(platform, account)
+        if not slots:
+            return None
+        now = now or datetime.now()
+        week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        upcoming = []
+        for slot in slots:
+            when = week_start + timedelta(hours=slot)
+            upcoming.append(when if when > now else when + timedelta(days=7))
+        return min(upcoming)
+
+
+class EngagementCollector:
+    """Polls due posts in bulk per platform and account, backing off when a platform rate-limits us"""
+
+    def __init__(self, store: EngagementStore, fetch: Callable[[str, str, List[str]], Dict], batch_limit: int = 200):
+        self.store = store
+        self.fetch = fetch
+        self.batch_limit = batch_limit
+        self._backoff_until: Dict[str, float] = {}
+
+    def collect(self) -> Dict[str, int]:
+        """One collection round; returns how many posts changed score per platform"""
+        changed = {}
+        for platform in platforms.with_status('supported'):
+            if time.time() < self._backoff_until.get(platform, 0):
+                continue
+            by_account: Dict[str, List[str]] = {}
+            for post_id, account in self.store.due_posts(platform, self.batch_limit):
+                by_account.setdefault(account, []).append(post_id)
+            for account, post_ids in by_account.items():
+                try:
+                    counts = self.fetch(platform, account, post_ids)
+                except RateLimited as e:
+                    self._backoff_until[platform] = time.time() + e.retry_after
+                    logger.warning(f"Engagement collection for {platform} paused: {e}")
+                    break
+                except Exception as e:
+                    logger.error(f"Engagement collection for {platform} failed: {e}")
+                    continue
+                changed[platform] = changed.get(platform, 0) + self.store.update_counts(platform, post_ids, counts)
+        return changed
@@ -0,0 +1,90 @@
+"""
+Event Bus - In-process fan-out of campaign events to stream subscribers
+Publishing never blocks: each subscriber has a bounded buffer that drops its
+oldest events when the client falls behind.
+"""
+import itertools
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class Subscription:
+    """One client's bounded view of the event stream"""
+
+    def __init__(self, bus: 'EventBus', topic: Optional[str], maxlen: int):
+        self.bus = bus
+        self.topic = topic
+        self.dropped = 0
+        self._events = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self.closed = False
+
+    def push(self, item: Tuple[int, str, Dict]):
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(item)
+            self._cond.notify()
+
+    def get(self, timeout: float) -> Tuple[List[Tuple[int, str, Dict]], int]:
+        """Wait up to timeout; returns (events, dropped since last call)"""
+        with self._cond:
+            if not self._events and not self.closed:
+                self._cond.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+    def close(self):
+        self.bus.unsubscribe(self)
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+
+class EventBus:
+    """Topic-keyed publish/subscribe; topic None receives everything"""
+
+    def __init__(self, buffer_size: int = 256, history_size: int = 512):
+        self.buffer_size = buffer_size
+        self._subscribers: Dict[Optional[str], Set[Subscription]] = {}
+        self._history = deque(maxlen=history_size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: Optional[str] = None, last_event_id: Optional[int] = None) -> Subscription:
+        """New subscription, replaying retained events after last_event_id (SSE reconnects)"""
+        subscription = Subscription(self, topic, self.buffer_size)
+        with self._lock:
+            if last_event_id is not None:
+                for item in self._history:
+                    if item[0] > last_event_id and (topic is None or item[3] == topic):
+                        subscription.push(item[:3])
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.topic]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, event: str, data: Dict, topic: Optional[str] = None) -> int:
+        """Fan out to subscribers of topic and of everything; returns the event id"""
+        with self._lock:
+            event_id = next(self._ids)
+            self._history.append((event_id, event, data, topic))
+            targets = list(self._subscribers.get(topic, ()))
+            if topic is not None:
+                targets.extend(self._subscribers.get(None, ()))
+        for subscription in targets:
+            subscription.push((event_id, event, data))
+        return event_id
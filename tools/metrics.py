@@ -0,0 +1,166 @@
+"""
+Metrics - Counters and histograms exposed in the Prometheus text format
+Writers update a per-thread shard without taking a lock; a scrape merges the
+shards. Shards of finished threads are folded into a retired total.
+"""
+import bisect
+import threading
+import weakref
+from typing import Callable, Dict, List, Sequence, Tuple
+
+REGISTRY: List['_Metric'] = []
+
+# Seconds; covers sub-millisecond routes up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    TYPE = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards: Dict[int, Dict] = {}
+        self._retired: Dict = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            key = id(values)
+            with self._lock:
+                self._shards[key] = values
+            weakref.finalize(threading.current_thread(), self._retire, key)
+            return values
+
+    def _retire(self, key: int):
+        with self._lock:
+            values = self._shards.pop(key, None)
+            if values:
+                self._merge(self._retired, values)
+
+    def _merge(self, into: Dict, values: Dict):
+        raise NotImplementedError
+
+    def collect(self) -> Dict:
+        """Totals per label tuple across all threads"""
+        total = {}
+        with self._lock:
+            self._merge(total, self._retired)
+            for values in list(self._shards.values()):
+                self._merge(total, dict(values))
+        return total
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.TYPE}']
+
+
+class Counter(_Metric):
+    """Monotonic total, e.g. posts sent per platform and result"""
+    TYPE = 'counter'
+
+    def inc(self, *labels, amount: float = 1):
+        values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def _merge(self, into: Dict, values: Dict):
+        for key, value in values.items():
+            into[key] = into.get(key, 0) + value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in sorted(self.collect().items()):
+            lines.append(f'{self.name}{_format_labels(self.labels, key)} {value}')
+        return lines
+
+
+class Histogram(_Metric):
+    """Bucketed observations plus sum and count, e.g. latencies in seconds"""
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        values = self._shard()
+        slots = values.get(labels)
+        if slots is None:
+            # One slot per bucket, one for +Inf, then sum and count
+            slots = values[labels] = [0] * (len(self.buckets) + 3)
+        slots[bisect.bisect_left(self.buckets, value)] += 1
+        slots[-2] += value
+        slots[-1] += 1
+
+    def _merge(self, into: Dict, values: Dict):
+        for key, slots in values.items():
+            merged = into.setdefault(key, [0] * len(slots))
+            for i, value in enumerate(list(slots)):
+                merged[i] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, slots in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), slots):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {slots[-2]}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {slots[-1]}')
+        return lines
+
+
+class Gauge(_Metric):
+    """Point-in-time values computed at scrape time by a callback"""
+    TYPE = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), callback: Callable[[], Dict] = None):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def collect(self) -> Dict:
+        return self.callback() if self.callback else {}
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in sorted(self.collect().items()):
+            lines.append(f'{self.name}{_format_labels(self.labels, key)} {value}')
+        return lines
+
+
+def render_all() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Mandy's metrics
+HTTP_LATENCY = Histogram('mandy_http_request_duration_seconds', 'Flask request latency by route', ('route', 'method', 'status'))
+SCHEDULER_LAG = Histogram('mandy_scheduler_lag_seconds', 'Delay between a job\'s scheduled and actual run time')
+SCHEDULER_JOBS = Counter('mandy_scheduler_jobs_total', 'Scheduler job outcomes', ('outcome',))
+POST_LATENCY = Histogram('mandy_post_duration_seconds', 'Time to publish a post', ('platform',))
+POSTS = Counter('mandy_posts_total', 'Posts attempted by platform and result code', ('platform', 'code'))
+LLM_LATENCY = Histogram('mandy_llm_duration_seconds', 'LLM generation latency', ('platform',))
+LLM_TOKENS = Counter('mandy_llm_tokens_total', 'LLM tokens by kind', ('kind',))
+LLM_CALLS = Counter('mandy_llm_calls_total', 'LLM calls by prompt cache result', ('cache',))
+WEBHOOK_EVENTS = Counter('mandy_webhook_events_total', 'Webhook events by delivery stage', ('outcome',))
+QUEUE_DEPTH = Gauge('mandy_queue_depth', 'Scheduled jobs and pre-generated posts waiting', ('queue',))
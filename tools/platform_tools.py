@@ -4,25 +4,42 @@ v1.0 Supported: Bluesky, Mastodon, Reddit
 Coming Soon: Instagram, LinkedIn, Facebook, TikTok, YouTube, Threads, Pinterest
 """
 import os
-from typing import Dict, List
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional
 from abc import ABC, abstractmethod
 import logging
 import requests
 from datetime import datetime
+from . import platforms
+from .content_adapter import URL_LENGTHS, adapt_text
+from .engagement import RateLimited
+from .tracing import span
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _retry_after(response, default: float = 300) -> float:
+    """Seconds to back off after a 429, from Retry-After when the server sends it"""
+    try:
+        return float(response.headers.get('Retry-After', default))
+    except (TypeError, ValueError):
+        return default
+
+
 class BasePlatformTool(ABC):
     """Base class for all platform posting tools"""
     
-    def __init__(self):
+    def __init__(self, credentials: Optional[Mapping[str, str]] = None):
         self.authenticated = False
-        self._load_credentials()
+        # Explicit credentials win; the environment is only the fallback
+        self._load_credentials(os.environ if credentials is None else credentials)
     
     @abstractmethod
-    def _load_credentials(self):
+    def _load_credentials(self, credentials: Mapping[str, str]):
         pass
     
     @abstractmethod
@@ -36,15 +53,26 @@ class BasePlatformTool(ABC):
     @abstractmethod
     def get_status(self) -> Dict:
         pass
+    
+    def account_key(self) -> str:
+        """Stable name of the posting account, used to learn per-account posting times"""
+        return ''
+    
+    def fetch_engagement(self, post_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        """Current likes/reposts/replies per post id; raises RateLimited on 429"""
+        return {}
 
 
 class BlueskyTool(BasePlatformTool):
     """Tool for posting to Bluesky - FREE, instant setup"""
     
-    def _load_credentials(self):
-        self.handle = os.getenv('BLUESKY_HANDLE')
-        self.app_password = os.getenv('BLUESKY_APP_PASSWORD')
+    def _load_credentials(self, credentials: Mapping[str, str]):
+        self.handle = credentials.get('BLUESKY_HANDLE')
+        self.app_password = credentials.get('BLUESKY_APP_PASSWORD')
+        # PDS host; bsky.social unless the account lives on a self-hosted server
+        self.service = (credentials.get('BLUESKY_SERVICE') or 'https://bsky.social').rstrip('/')
         self.access_token = None
+        self.refresh_token = None
         self.did = None
     
     def authenticate(self) -> bool:
@@ -54,18 +82,16 @@ class BlueskyTool(BasePlatformTool):
         
         try:
             response = requests.post(
-                'https://bsky.social/xrpc/com.atproto.server.createSession',
+                f'{self.service}/xrpc/com.atproto.server.createSession',
                 json={
                     'identifier': self.handle,
                     'password': self.app_password
-                }
+                },
+                timeout=30
             )
             
             if response.status_code == 200:
-                data = response.json()
-                self.access_token = data['accessJwt']
-                self.did = data['did']
-                self.authenticated = True
+                self._set_session(response.json())
                 return True
             else:
                 logger.error(f"Bluesky auth failed: {response.text}")
@@ -75,6 +101,54 @@ class BlueskyTool(BasePlatformTool):
             logger.error(f"Bluesky auth error: {e}")
             return False
     
+    def _set_session(self, data: Dict):
+        self.access_token = data['accessJwt']
+        self.refresh_token = data.get('refreshJwt')
+        self.did = data['did']
+        self.authenticated = True
+    
+    def _refresh(self) -> bool:
+        """New access token from the refresh token; a new session if that has expired too"""
+        if self.refresh_token:
+            try:
+                response = requests.post(
+                    f'{self.service}/xrpc/com.atproto.server.refreshSession',
+                    headers={'Authorization': f'Bearer {self.refresh_token}'},
+                    timeout=30
+                )
+                if response.status_code == 200:
+                    self._set_session(response.json())
+                    return True
+            except requests.RequestException as e:
+                logger.warning(f"Bluesky session refresh error: {e}")
+        self.authenticated = False
+        return self.authenticate()
+    
+    @staticmethod
+    def _token_expired(response) -> bool:
+        if response.status_code not in (400, 401):
+            return False
+        try:
+            return response.json().get('error') in ('ExpiredToken', 'InvalidToken')
+        except ValueError:
+            return False
+    
+    def _xrpc(self, method: str, endpoint: str, **kwargs):
+        """Authenticated XRPC call; access tokens are short-lived, so an expired one is refreshed and the call retried once"""
+        def call():
+            return requests.request(
+                method,
+                f'{self.service}/xrpc/{endpoint}',
+                headers={'Authorization': f'Bearer {self.access_token}'},
+                timeout=30,
+                **kwargs
+            )
+        
+        response = call()
+        if self._token_expired(response) and self._refresh():
+            response = call()
+        return response
+    
     def post(self, content: str, **kwargs) -> Dict:
         if not self.authenticated:
             if not self.authenticate():
@@ -83,14 +157,14 @@ class BlueskyTool(BasePlatformTool):
         try:
             record = {
                 '$type': 'app.bsky.feed.post',
-                'text': content[:300],  # Bluesky limit
+                'text': adapt_text(content, 300),  # Bluesky limit (graphemes)
                 'createdAt': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.000Z'),
                 'langs': ['en']
             }
             
-            response = requests.post(
-                'https://bsky.social/xrpc/com.atproto.repo.createRecord',
-                headers={'Authorization': f'Bearer {self.access_token}'},
+            response = self._xrpc(
+                'POST',
+                'com.atproto.repo.createRecord',
                 json={
                     'repo': self.did,
                     'collection': 'app.bsky.feed.post',
@@ -107,21 +181,46 @@ class BlueskyTool(BasePlatformTool):
                     'url': f"https://bsky.app/profile/{self.handle}/post/{data.get('uri', '').split('/')[-1]}"
                 }
             else:
-                return {'success': False, 'error': response.text}
+                return {'success': False, 'error': response.text, 'status_code': response.status_code}
                 
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
     def get_status(self) -> Dict:
         return {'platform': 'bluesky', 'authenticated': self.authenticated}
+    
+    def account_key(self) -> str:
+        return self.handle or ''
+    
+    def fetch_engagement(self, post_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        if not self.authenticated and not self.authenticate():
+            return {}
+        
+        counts = {}
+        for i in range(0, len(post_ids), 25):  # getPosts takes at most 25 URIs
+            response = self._xrpc('GET', 'app.bsky.feed.getPosts', params={'uris': post_ids[i:i + 25]})
+            if response.status_code == 429:
+                raise RateLimited(_retry_after(response))
+            if response.status_code != 200:
+                logger.warning(f"Bluesky getPosts failed: {response.text}")
+                continue
+            for post in response.json().get('posts', []):
+                counts[post['uri']] = {
+                    'likes': post.get('likeCount', 0),
+                    'reposts': post.get('repostCount', 0) + post.get('quoteCount', 0),
+                    'replies': post.get('replyCount', 0)
+                }
+        return counts
 
 
 class MastodonTool(BasePlatformTool):
     """Tool for posting to Mastodon - FREE, instant setup"""
     
-    def _load_credentials(self):
-        self.instance = os.getenv('MASTODON_INSTANCE', 'mastodon.social')
-        self.access_token = os.getenv('MASTODON_ACCESS_TOKEN')
+    def _load_credentials(self, credentials: Mapping[str, str]):
+        self.instance = credentials.get('MASTODON_INSTANCE') or 'mastodon.social'
+        self.access_token = credentials.get('MASTODON_ACCESS_TOKEN')
+        # A bare host means HTTPS; an explicit scheme (e.g. a local test server) is kept
+        self.base_url = (self.instance if '://' in self.instance else f'https://{self.instance}').rstrip('/')
     
     def authenticate(self) -> bool:
         if not self.access_token:
@@ -130,7 +229,7 @@ class MastodonTool(BasePlatformTool):
         
         try:
             response = requests.get(
-                f'https://{self.instance}/api/v1/accounts/verify_credentials',
+                f'{self.base_url}/api/v1/accounts/verify_credentials',
                 headers={'Authorization': f'Bearer {self.access_token}'}
             )
             
@@ -146,6 +245,54 @@ class MastodonTool(BasePlatformTool):
             logger.error(f"Mastodon auth error: {e}")
             return False
     
+    def _set_session(self, data: Dict):
+        self.access_token = data['accessJwt']
+        self.refresh_token = data.get('refreshJwt')
+        self.did = data['did']
+        self.authenticated = True
+    
+    def _refresh(self) -> bool:
+        """New access token from the refresh token; a new session if that has expired too"""
+        if self.refresh_token:
+            try:
+                response = requests.post(
+                    f'{self.service}/xrpc/com.atproto.server.refreshSession',
+                    headers={'Authorization': f'Bearer {self.refresh_token}'},
+                    timeout=30
+                )
+                if response.status_code == 200:
+                    self._set_session(response.json())
+                    return True
+            except requests.RequestException as e:
+                logger.warning(f"Bluesky session refresh error: {e}")
+        self.authenticated = False
+        return self.authenticate()
+    
+    @staticmethod
+    def _token_expired(response) -> bool:
+        if response.status_code not in (400, 401):
+            return False
+        try:
+            return response.json().get('error') in ('ExpiredToken', 'InvalidToken')
+        except ValueError:
+            return False
+    
+    def _xrpc(self, method: str, endpoint: str, **kwargs):
+        """Authenticated XRPC call; access tokens are short-lived, so an expired one is refreshed and the call retried once"""
+        def call():
+            return requests.request(
+                method,
+                f'{self.service}/xrpc/{endpoint}',
+                headers={'Authorization': f'Bearer {self.access_token}'},
+                timeout=30,
+                **kwargs
+            )
+        
+        response = call()
+        if self._token_expired(response) and self._refresh():
+            response = call()
+        return response
+    
     def post(self, content: str, **kwargs) -> Dict:
         if not self.authenticated:
             if not self.authenticate():
@@ -153,13 +300,13 @@ class MastodonTool(BasePlatformTool):
         
         try:
             response = requests.post(
-                f'https://{self.instance}/api/v1/statuses',
+                f'{self.base_url}/api/v1/statuses',
                 headers={
                     'Authorization': f'Bearer {self.access_token}',
                     'Content-Type': 'application/json'
                 },
                 json={
-                    'status': content[:500],  # Mastodon default limit
+                    'status': adapt_text(content, 500, URL_LENGTHS['mastodon']),  # Mastodon default limit
                     'visibility': kwargs.get('visibility', 'public')
                 }
             )
@@ -173,23 +320,60 @@ class MastodonTool(BasePlatformTool):
                     'url': data.get('url')
                 }
             else:
-                return {'success': False, 'error': response.text}
+                return {'success': False, 'error': response.text, 'status_code': response.status_code}
                 
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
     def get_status(self) -> Dict:
         return {'platform': 'mastodon', 'authenticated': self.authenticated}
+    
+    def account_key(self) -> str:
+        # Posts are recorded as acct@instance, so the account has to be known first
+        if not self.authenticated and self.access_token:
+            self.authenticate()
+        account = getattr(self, 'account', None) or {}
+        return f"{account['acct']}@{self.instance}" if account.get('acct') else ''
+    
+    def fetch_engagement(self, post_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        if not self.access_token:
+            return {}
+        
+        headers = {'Authorization': f'Bearer {self.access_token}'}
+        counts = {}
+        for i in range(0, len(post_ids), 20):  # GET /api/v1/statuses takes at most 20 ids
+            batch = post_ids[i:i + 20]
+            response = requests.get(f'{self.base_url}/api/v1/statuses', headers=headers, params={'id[]': batch}, timeout=30)
+            if response.status_code == 429:
+                raise RateLimited(_retry_after(response))
+            if response.status_code == 200:
+                statuses = response.json()
+            else:
+                # Servers before 4.3 have no bulk lookup; fall back to one request per status
+                statuses = []
+                for post_id in batch:
+                    response = requests.get(f'{self.base_url}/api/v1/statuses/{post_id}', headers=headers, timeout=30)
+                    if response.status_code == 429:
+                        raise RateLimited(_retry_after(response))
+                    if response.status_code == 200:
+                        statuses.append(response.json())
+            for status in statuses:
+                counts[str(status['id'])] = {
+                    'likes': status.get('favourites_count', 0),
+                    'reposts': status.get('reblogs_count', 0),
+                    'replies': status.get('replies_count', 0)
+                }
+        return counts
 
 
 class RedditTool(BasePlatformTool):
     """Tool for posting to Reddit - FREE for non-commercial"""
     
-    def _load_credentials(self):
-        self.client_id = os.getenv('REDDIT_CLIENT_ID')
-        self.client_secret = os.getenv('REDDIT_CLIENT_SECRET')
-        self.username = os.getenv('REDDIT_USERNAME')
-        self.password = os.getenv('REDDIT_PASSWORD')
+    def _load_credentials(self, credentials: Mapping[str, str]):
+        self.client_id = credentials.get('REDDIT_CLIENT_ID')
+        self.client_secret = credentials.get('REDDIT_CLIENT_SECRET')
+        self.username = credentials.get('REDDIT_USERNAME')
+        self.password = credentials.get('REDDIT_PASSWORD')
     
     def authenticate(self) -> bool:
         if not all([self.client_id, self.client_secret, self.username, self.password]):
@@ -213,6 +397,54 @@ class RedditTool(BasePlatformTool):
             logger.error(f"Reddit auth failed: {e}")
             return False
     
+    def _set_session(self, data: Dict):
+        self.access_token = data['accessJwt']
+        self.refresh_token = data.get('refreshJwt')
+        self.did = data['did']
+        self.authenticated = True
+    
+    def _refresh(self) -> bool:
+        """New access token from the refresh token; a new session if that has expired too"""
+        if self.refresh_token:
+            try:
+                response = requests.post(
+                    f'{self.service}/xrpc/com.atproto.server.refreshSession',
+                    headers={'Authorization': f'Bearer {self.refresh_token}'},
+                    timeout=30
+                )
+                if response.status_code == 200:
+                    self._set_session(response.json())
+                    return True
+            except requests.RequestException as e:
+                logger.warning(f"Bluesky session refresh error: {e}")
+        self.authenticated = False
+        return self.authenticate()
+    
+    @staticmethod
+    def _token_expired(response) -> bool:
+        if response.status_code not in (400, 401):
+            return False
+        try:
+            return response.json().get('error') in ('ExpiredToken', 'InvalidToken')
+        except ValueError:
+            return False
+    
+    def _xrpc(self, method: str, endpoint: str, **kwargs):
+        """Authenticated XRPC call; access tokens are short-lived, so an expired one is refreshed and the call retried once"""
+        def call():
+            return requests.request(
+                method,
+                f'{self.service}/xrpc/{endpoint}',
+                headers={'Authorization': f'Bearer {self.access_token}'},
+                timeout=30,
+                **kwargs
+            )
+        
+        response = call()
+        if self._token_expired(response) and self._refresh():
+            response = call()
+        return response
+    
     def post(self, content: str, **kwargs) -> Dict:
         if not self.authenticated:
             if not self.authenticate():
@@ -234,20 +466,44 @@ class RedditTool(BasePlatformTool):
                 'platform': 'reddit'
             }
         except Exception as e:
-            return {'success': False, 'error': str(e)}
+            # praw surfaces throttling as TooManyRequests or a RATELIMIT API error
+            limited = type(e).__name__ == 'TooManyRequests' or 'RATELIMIT' in str(e)
+            return {'success': False, 'error': str(e), 'status_code': 429 if limited else None}
     
     def get_status(self) -> Dict:
         return {'platform': 'reddit', 'authenticated': self.authenticated}
+    
+    def account_key(self) -> str:
+        return self.username or ''
+    
+    def fetch_engagement(self, post_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        if not self.authenticated and not self.authenticate():
+            return {}
+        
+        counts = {}
+        try:
+            # praw batches info() lookups 100 fullnames per request
+            for submission in self.reddit.info(fullnames=[f't3_{post_id}' for post_id in post_ids]):
+                counts[submission.id] = {
+                    'likes': submission.score,
+                    'reposts': getattr(submission, 'num_crossposts', 0),
+                    'replies': submission.num_comments
+                }
+        except Exception as e:
+            if type(e).__name__ == 'TooManyRequests':
+                raise RateLimited()
+            raise
+        return counts
 
 
 class ComingSoonTool(BasePlatformTool):
     """Placeholder for platforms coming soon"""
     
-    def __init__(self, platform_name: str):
+    def __init__(self, platform_name: str, credentials: Optional[Mapping[str, str]] = None):
         self.platform_name = platform_name
-        super().__init__()
+        super().__init__(credentials)
     
-    def _load_credentials(self):
+    def _load_credentials(self, credentials: Mapping[str, str]):
         pass
     
     def authenticate(self) -> bool:
@@ -270,55 +526,59 @@ class ComingSoonTool(BasePlatformTool):
 
 
 class PlatformManager:
-    """Manages all platform tools"""
-    
-    # v1.0 Supported platforms
-    SUPPORTED_PLATFORMS = {
-        'bluesky': BlueskyTool,
-        'mastodon': MastodonTool,
-        'reddit': RedditTool,
-    }
-    
-    # Coming soon - awaiting API approval
-    COMING_SOON = ['instagram', 'linkedin', 'facebook', 'tiktok', 'youtube', 'threads', 'pinterest']
-    
-    # Not planned (too expensive)
-    # 'x' / 'twitter' - $100/mo minimum
-    
-    PLATFORM_INFO = {
-        'bluesky': {'icon': '🦋', 'name': 'Bluesky', 'max_chars': 300, 'status': 'supported'},
-        'mastodon': {'icon': '🐘', 'name': 'Mastodon', 'max_chars': 500, 'status': 'supported'},
-        'reddit': {'icon': '🔶', 'name': 'Reddit', 'max_chars': 40000, 'status': 'supported'},
-        'instagram': {'icon': '📸', 'name': 'Instagram', 'max_chars': 2200, 'status': 'coming_soon'},
-        'linkedin': {'icon': '💼', 'name': 'LinkedIn', 'max_chars': 3000, 'status': 'coming_soon'},
-        'facebook': {'icon': '📘', 'name': 'Facebook', 'max_chars': 63206, 'status': 'coming_soon'},
-        'tiktok': {'icon': '🎵', 'name': 'TikTok', 'max_chars': 2200, 'status': 'coming_soon'},
-        'youtube': {'icon': '📺', 'name': 'YouTube', 'max_chars': 5000, 'status': 'coming_soon'},
-        'threads': {'icon': '🧵', 'name': 'Threads', 'max_chars': 500, 'status': 'coming_soon'},
-        'pinterest': {'icon': '📌', 'name': 'Pinterest', 'max_chars': 500, 'status': 'coming_soon'},
-    }
-    
-    def __init__(self):
+    """Builds platform tools from the platform registry on first use"""
+    
+    # Authenticated tools kept per explicit credential set
+    MAX_SCOPED_TOOLS = 32
+    
+    def __init__(self, credentials: Optional[Mapping[str, str]] = None):
+        self.credentials = credentials
         self.tools = {}
-        self._initialize_tools()
-    
-    def _initialize_tools(self):
-        # Initialize supported platforms
-        for platform, tool_class in self.SUPPORTED_PLATFORMS.items():
-            tool = tool_class()
-            tool.authenticate()  # Try to auth on init
-            self.tools[platform] = tool
+        self._scoped = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _shared_tool(self, platform: str) -> Optional[BasePlatformTool]:
+        """Tool using the manager's credentials; None for unknown or not-planned platforms"""
+        tool = self.tools.get(platform)
+        if tool is not None:
+            return tool
+        spec = platforms.get(platform)
+        if spec is None or spec['status'] == 'not_planned':
+            return None
+        
+        tool_class = platforms.tool_class(platform) if spec['status'] == 'supported' else None
+        with self._lock:
+            tool = self.tools.get(platform)
+            if tool is None:
+                tool = self.tools[platform] = tool_class(self.credentials) if tool_class else ComingSoonTool(platform)
+        return tool
+    
+    def _tool_for(self, platform: str, credentials: Optional[Mapping[str, str]]) -> BasePlatformTool:
+        """Shared tool, or one bound to the given credentials so accounts never share state"""
+        shared = self._shared_tool(platform)
+        if credentials is None or isinstance(shared, ComingSoonTool):
+            return shared
         
-        # Initialize coming soon placeholders
-        for platform in self.COMING_SOON:
-            self.tools[platform] = ComingSoonTool(platform)
+        fingerprint = hashlib.sha256(json.dumps(dict(credentials), sort_keys=True).encode()).hexdigest()
+        key = (platform, fingerprint)
+        with self._lock:
+            tool = self._scoped.get(key)
+            if tool is None:
+                tool = self._scoped[key] = type(shared)(credentials)
+                if len(self._scoped) > self.MAX_SCOPED_TOOLS:
+                    self._scoped.popitem(last=False)
+            else:
+                self._scoped.move_to_end(key)
+        return tool
     
     def get_available_platforms(self) -> List[Dict]:
         result = []
-        for pid, info in self.PLATFORM_INFO.items():
-            tool = self.tools.get(pid)
+        for info in platforms.all_platforms():
+            if info['status'] == 'not_planned':
+                continue
+            tool = self.tools.get(info['id'])
             result.append({
-                'id': pid,
+                'id': info['id'],
                 'name': info['name'],
                 'icon': info['icon'],
                 'max_chars': info['max_chars'],
@@ -328,18 +588,41 @@ class PlatformManager:
             })
         return result
     
-    def post(self, platform: str, content: str, **kwargs) -> Dict:
-        if platform not in self.tools:
+    def post(self, platform: str, content: str, credentials: Optional[Mapping[str, str]] = None, **kwargs) -> Dict:
+        platform = platforms.resolve(platform)
+        if self._shared_tool(platform) is None:
             return {'success': False, 'error': f'Platform {platform} not supported'}
-        return self.tools[platform].post(content=content, **kwargs)
+        with span('PlatformManager.post', platform=platform):
+            tool = self._tool_for(platform, credentials)
+            result = tool.post(content=content, **kwargs)
+            if result.get('success'):
+                result.setdefault('account', tool.account_key())
+            return result
+    
+    def account_key(self, platform: str, credentials: Optional[Mapping[str, str]] = None) -> str:
+        platform = platforms.resolve(platform)
+        if self._shared_tool(platform) is None:
+            return ''
+        return self._tool_for(platform, credentials).account_key()
+    
+    def fetch_engagement(self, platform: str, post_ids: List[str], credentials: Optional[Mapping[str, str]] = None) -> Dict:
+        platform = platforms.resolve(platform)
+        if self._shared_tool(platform) is None:
+            return {}
+        with span('PlatformManager.fetch_engagement', platform=platform, posts=len(post_ids)):
+            return self._tool_for(platform, credentials).fetch_engagement(post_ids)
     
-    def test_connection(self, platform: str) -> Dict:
-        if platform not in self.tools:
+    def test_connection(self, platform: str, credentials: Optional[Mapping[str, str]] = None) -> Dict:
+        platform = platforms.resolve(platform)
+        tool = self._shared_tool(platform)
+        if tool is None:
             return {'success': False, 'error': 'Platform not found'}
         
-        tool = self.tools[platform]
         if isinstance(tool, ComingSoonTool):
             return {'success': False, 'error': 'Coming soon - awaiting API approval', 'coming_soon': True}
         
+        if credentials is not None:
+            # Fresh instance: a failed test must not evict a working session
+            tool = type(tool)(credentials)
         success = tool.authenticate()
         return {'success': success, 'platform': platform}
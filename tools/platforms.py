@@ -0,0 +1,206 @@
+"""
+Platforms - The one registry of what Mandy knows about each platform
+Every platform declares its display info, character and image size limits,
+status, default posting schedule, content style and tool class. Tool classes are named as
+'module:Class' and only imported when a tool is first built.
+
+Plugins add or override platforms through the 'mandy.platforms' entry-point
+group: the entry point's name is the platform id and it loads to a spec dict,
+e.g. in a plugin's pyproject.toml:
+
+    [project.entry-points."mandy.platforms"]
+    pixelfed = "mandy_pixelfed:PLATFORM"
+"""
+import importlib
+import threading
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = 'mandy.platforms'
+
+# Statuses: supported (has a tool), coming_soon (awaiting API approval),
+# not_planned (content only - posting is too expensive)
+DEFAULTS = {
+    'status': 'coming_soon',
+    'tool': None,
+    # Longest image edge the platform keeps; the client scales larger images down before upload
+    'max_image_px': 2048,
+    'schedule': {'times': ['12:00'], 'days': 'daily'},
+    'style': 'clear, engaging',
+    'tone': 'friendly, authentic'
+}
+REQUIRED = ('name', 'icon', 'max_chars')
+
+BUILTIN = {
+    'bluesky': {
+        'name': 'Bluesky', 'icon': '🦋', 'max_chars': 300, 'max_image_px': 2000, 'status': 'supported',
+        'tool': 'tools.platform_tools:BlueskyTool',
+        'schedule': {'times': ['12:00'], 'days': 'daily'},
+        'style': 'conversational, concise, light on hashtags',
+        'tone': 'genuine, curious, unpolished'
+    },
+    'mastodon': {
+        'name': 'Mastodon', 'icon': '🐘', 'max_chars': 500, 'max_image_px': 3840, 'status': 'supported',
+        'tool': 'tools.platform_tools:MastodonTool',
+        'schedule': {'times': ['12:00'], 'days': 'daily'},
+        'style': 'community-minded, plain text, CamelCase hashtags',
+        'tone': 'thoughtful, non-corporate'
+    },
+    'reddit': {
+        'name': 'Reddit', 'icon': '🔶', 'max_chars': 40000, 'max_image_px': 4096, 'status': 'supported',
+        'tool': 'tools.platform_tools:RedditTool',
+        'schedule': {'times': ['10:00', '19:00'], 'days': 'daily'},
+        'style': 'authentic, community-focused, non-promotional',
+        'tone': 'genuine, helpful, NOT salesy'
+    },
+    'instagram': {
+        'name': 'Instagram', 'icon': '📸', 'max_chars': 2200, 'max_image_px': 1440,
+        'schedule': {'times': ['11:00', '21:00'], 'days': 'daily'},
+        'style': 'visual-first, aesthetic, hashtag-rich',
+        'tone': 'aspirational, authentic'
+    },
+    'linkedin': {
+        'name': 'LinkedIn', 'icon': '💼', 'max_chars': 3000, 'max_image_px': 4096,
+        'schedule': {'times': ['07:30', '12:00'], 'days': 'weekdays'},
+        'style': 'professional, thought-leadership, storytelling',
+        'tone': 'professional, insightful, value-driven'
+    },
+    'facebook': {
+        'name': 'Facebook', 'icon': '📘', 'max_chars': 63206, 'max_image_px': 2048,
+        'schedule': {'times': ['09:00', '13:00', '19:00'], 'days': 'daily'},
+        'style': 'visual-first, engaging, shareable',
+        'tone': 'friendly, relatable'
+    },
+    'tiktok': {
+        'name': 'TikTok', 'icon': '🎵', 'max_chars': 2200, 'max_image_px': 1920,
+        'schedule': {'times': ['12:00', '19:00', '22:00'], 'days': 'daily'},
+        'style': 'trend-aware, hook-driven, entertaining',
+        'tone': 'casual, fun, gen-z friendly'
+    },
+    'youtube': {
+        'name': 'YouTube', 'icon': '📺', 'max_chars': 5000, 'max_image_px': 2560,
+        'schedule': {'times': ['15:00'], 'days': 'daily'},
+        'style': 'SEO-optimized, descriptive',
+        'tone': 'informative, engaging'
+    },
+    'threads': {
+        'name': 'Threads', 'icon': '🧵', 'max_chars': 500, 'max_image_px': 1440,
+        'schedule': {'times': ['09:00', '18:00'], 'days': 'daily'},
+        'style': 'conversational, authentic',
+        'tone': 'casual, genuine'
+    },
+    'pinterest': {
+        'name': 'Pinterest', 'icon': '📌', 'max_chars': 500, 'max_image_px': 1500,
+        'schedule': {'times': ['14:00', '21:00'], 'days': 'daily'},
+        'style': 'descriptive, keyword-rich',
+        'tone': 'inspiring, actionable'
+    },
+    # $100/mo API minimum: Mandy writes X posts but doesn't publish them
+    'x': {
+        'name': 'X (Twitter)', 'icon': '𝕏', 'max_chars': 280, 'max_image_px': 4096, 'status': 'not_planned',
+        'schedule': {'times': ['09:00', '12:00', '17:00'], 'days': 'daily'},
+        'style': 'concise, punchy, thread-friendly',
+        'tone': 'casual, witty, conversational'
+    },
+}
+
+# Older names still accepted from clients and stored jobs
+ALIASES = {'meta': 'facebook', 'twitter': 'x'}
+
+_registry: Dict[str, Dict] = {}
+_tool_classes: Dict[str, type] = {}
+# Re-entrant: plugins are registered while the registry is being loaded
+_lock = threading.RLock()
+_loaded = False
+_loading = False
+
+
+def register(platform_id: str, spec: Dict):
+    """Add or replace a platform; spec needs name, icon and max_chars, and a tool if it is supported"""
+    missing = [key for key in REQUIRED if key not in spec]
+    if missing:
+        raise ValueError(f"Platform {platform_id} is missing {', '.join(missing)}")
+    merged = {**DEFAULTS, **spec, 'id': platform_id}
+    if merged['status'] == 'supported' and merged['tool'] is None:
+        raise ValueError(f"Platform {platform_id} is supported but has no tool")
+    with _lock:
+        _registry[platform_id] = merged
+        _tool_classes.pop(platform_id, None)
+
+
+def _load_plugins():
+    from importlib.metadata import entry_points
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            register(entry_point.name, entry_point.load())
+        except Exception as e:
+            logger.error(f"Could not load platform plugin {entry_point.name}: {e}")
+
+
+def _platforms() -> Dict[str, Dict]:
+    global _loaded, _loading
+    if not _loaded:
+        with _lock:
+            # Other threads wait here until plugins are in; a plugin looking platforms up while loading sees the builtins
+            if not _loaded and not _loading:
+                _loading = True
+                try:
+                    for platform_id, spec in BUILTIN.items():
+                        _registry.setdefault(platform_id, {**DEFAULTS, **spec, 'id': platform_id})
+                    _load_plugins()
+                    _loaded = True
+                finally:
+                    _loading = False
+    return _registry
+
+
+def resolve(platform_id: str) -> str:
+    return ALIASES.get(platform_id, platform_id)
+
+
+def get(platform_id: str) -> Optional[Dict]:
+    """The platform's spec, or None when it is unknown"""
+    return _platforms().get(resolve(platform_id))
+
+
+def all_platforms() -> List[Dict]:
+    return list(_platforms().values())
+
+
+def with_status(status: str) -> List[str]:
+    return [pid for pid, spec in _platforms().items() if spec['status'] == status]
+
+
+def schedule(platform_id: str) -> Dict:
+    """Default posting times; platforms without one post daily at noon"""
+    spec = get(platform_id)
+    return spec['schedule'] if spec else DEFAULTS['schedule']
+
+
+def max_chars(platform_id: str, default: int = 280) -> int:
+    spec = get(platform_id)
+    return spec['max_chars'] if spec else default
+
+
+def image_limits() -> Dict[str, int]:
+    """Longest image edge, in pixels, per platform"""
+    return {pid: spec['max_image_px'] for pid, spec in _platforms().items()}
+
+
+def tool_class(platform_id: str) -> Optional[type]:
+    """The platform's tool class, imported on first use; None if it has none"""
+    platform_id = resolve(platform_id)
+    tool = _tool_classes.get(platform_id)
+    if tool is not None:
+        return tool
+    spec = get(platform_id)
+    if spec is None or spec['tool'] is None:
+        return None
+    tool = spec['tool']
+    if isinstance(tool, str):
+        module, _, name = tool.partition(':')
+        tool = getattr(importlib.import_module(module), name)
+    _tool_classes[platform_id] = tool
+    return tool
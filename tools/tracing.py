@@ -0,0 +1,147 @@
+"""
+Tracing - Opt-in spans (Chrome trace format) and a sampling profiler (folded stacks)
+Disabled by default: span() then returns a shared no-op context manager.
+Enable spans for the whole process with MANDY_TRACE=1, or spans plus the
+sampler for a while with start(seconds), e.g. from the admin route.
+"""
+import os
+import sys
+import time
+import threading
+from collections import Counter, deque
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+_NOOP = nullcontext()
+_EPOCH = time.perf_counter_ns()
+# Idle leaf frames the sampler ignores so waiting threads don't drown the profile
+_IDLE = {
+    ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'),
+    ('selectors.py', 'select'), ('queue.py', 'get'), ('thread.py', '_worker')
+}
+
+_always_on = os.getenv('MANDY_TRACE') == '1'
+_enabled = _always_on
+_events = deque(maxlen=int(os.getenv('MANDY_TRACE_EVENTS', '100000')))
+_samples: Counter = Counter()
+_lock = threading.Lock()
+_session: Optional[Dict] = None
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name: str, args: Dict):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        _events.append({
+            'name': self.name,
+            'ph': 'X',
+            'ts': (self.start - _EPOCH) / 1000,
+            'dur': (end - self.start) / 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': self.args
+        })
+        return False
+
+
+def span(name: str, **args):
+    """Time a block as a trace span; free when tracing is off"""
+    if not _enabled:
+        return _NOOP
+    return _Span(name, args)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _sample(session: Dict):
+    me = threading.get_ident()
+    names = {}
+    while not session['stop'].wait(session['interval']):
+        if time.monotonic() >= session['deadline']:
+            break
+        for tid, frame in sys._current_frames().items():
+            if tid == me:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in _IDLE:
+                continue
+            if tid not in names:
+                names = {t.ident: t.name for t in threading.enumerate()}
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(tid, str(tid)))
+            _samples[';'.join(reversed(stack))] += 1
+    _finish(session)
+
+
+def _finish(session: Dict):
+    global _enabled, _session
+    with _lock:
+        session['stop'].set()
+        if _session is session:
+            _session = None
+            _enabled = _always_on
+
+
+def start(seconds: float, interval: float = 0.005) -> Dict:
+    """Record spans and sample all threads for `seconds`; clears the previous session"""
+    global _enabled, _session
+    with _lock:
+        if _session is not None:
+            _session['stop'].set()
+        _events.clear()
+        _samples.clear()
+        _session = {
+            'stop': threading.Event(),
+            'interval': interval,
+            'started': time.time(),
+            'deadline': time.monotonic() + seconds
+        }
+        _enabled = True
+        threading.Thread(target=_sample, args=(_session,), name='mandy-profiler', daemon=True).start()
+        return {'seconds': seconds, 'interval': interval}
+
+
+def stop():
+    """End the current session; spans stay on only when MANDY_TRACE=1"""
+    session = _session
+    if session is not None:
+        _finish(session)
+
+
+def status() -> Dict:
+    with _lock:
+        remaining = max(0.0, _session['deadline'] - time.monotonic()) if _session else 0.0
+    return {'enabled': _enabled, 'profiling': remaining > 0, 'remaining_seconds': round(remaining, 1),
+            'spans': len(_events), 'samples': sum(dict(_samples).values())}
+
+
+def chrome_trace() -> Dict:
+    """Spans as a Chrome trace (chrome://tracing, Perfetto, speedscope)"""
+    events: List[Dict] = list(_events)
+    pid = os.getpid()
+    for thread in threading.enumerate():
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread.ident, 'args': {'name': thread.name}})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def folded_stacks() -> str:
+    """Profiler samples in folded format (flamegraph.pl, speedscope)"""
+    samples = dict(_samples)
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(samples.items(), key=lambda item: -item[1]))
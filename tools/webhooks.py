@@ -0,0 +1,387 @@
+"""
+Webhooks - Signed, batched delivery of post outcomes to subscriber endpoints
+enqueue() only appends to memory, so the posting thread never waits on the
+network or the disk. A background thread group-commits queued events to a
+SQLite outbox and sends each endpoint one batch at a time from a small pool.
+A failing endpoint is backed off exponentially as a whole, so new events
+do not trigger extra requests; events that exhaust their own attempts stay
+in the outbox, marked dead, for inspection.
+
+Each request body is {"events": [...]} and carries
+X-Mandy-Timestamp and X-Mandy-Signature: sha256=HMAC(secret, "<timestamp>.<body>").
+
+Endpoints must be public: hosts resolving to loopback, private, link-local or
+multicast addresses are refused when subscribing, and every connection is
+checked again against the address actually connected to (DNS rebinding).
+Redirects are not followed.
+"""
+import hmac
+import json
+import time
+import uuid
+import random
+import socket
+import hashlib
+import secrets
+import sqlite3
+import ipaddress
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from .metrics import WEBHOOK_EVENTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENTS = ('post-sent', 'post-failed', 'rate-limited')
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    return hmac.new(secret.encode(), timestamp.encode() + b'.' + body, hashlib.sha256).hexdigest()
+
+
+def is_public(address: str) -> bool:
+    """True for globally routable unicast addresses"""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_url(url: str):
+    """Raise ValueError unless url is http(s) and its host only resolves to public addresses"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError('Webhook URL must be http(s)')
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, ValueError):
+        raise ValueError(f'Cannot resolve webhook host {parts.hostname}')
+    if not all(is_public(address) for address in addresses):
+        raise ValueError('Webhook URL must not point at a loopback, private, link-local or multicast address')
+
+
+class BlockedAddress(OSError):
+    """The endpoint's host resolved to an address webhooks may not reach"""
+
+
+class _PublicOnly:
+    def _new_conn(self):
+        sock = super()._new_conn()
+        address = sock.getpeername()[0]
+        if not is_public(address):
+            sock.close()
+            raise BlockedAddress(f'{self.host} resolved to non-public address {address}')
+        return sock
+
+
+class _PublicHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = type('PublicHTTPConnection', (_PublicOnly, HTTPConnection), {})
+
+
+class _PublicHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = type('PublicHTTPSConnection', (_PublicOnly, HTTPSConnection), {})
+
+
+class PublicOnlyAdapter(HTTPAdapter):
+    """Transport that checks the address of every new connection, after DNS resolution"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _PublicHTTPConnectionPool,
+            'https': _PublicHTTPSConnectionPool
+        }
+
+
+class WebhookDispatcher:
+    """Webhook subscriptions per workspace plus a persistent outbox and its delivery threads"""
+
+    SCHEMA = (
+        '''CREATE TABLE IF NOT EXISTS mandy_webhooks (
+            id TEXT PRIMARY KEY,
+            workspace TEXT NOT NULL,
+            url TEXT NOT NULL,
+            secret TEXT NOT NULL,
+            events TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS mandy_webhook_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            webhook_id TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL
+        )''',
+        '''CREATE INDEX IF NOT EXISTS ix_mandy_webhook_outbox_due
+            ON mandy_webhook_outbox (webhook_id, next_attempt)''',
+    )
+
+    def __init__(
+        self,
+        db_path: str,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        max_attempts: int = 10,
+        max_backoff: float = 3600,
+        timeout: float = 10,
+        max_workers: int = 4,
+        allow_private: bool = False
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        # Only for local receivers in development and benchmarks
+        self.allow_private = allow_private
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        with self._db_lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+            rows = self._conn.execute('SELECT id, workspace, url, secret, events FROM mandy_webhooks').fetchall()
+
+        self._hooks: Dict[str, Dict] = {}
+        for webhook_id, workspace, url, secret, events in rows:
+            self._hooks[webhook_id] = {'id': webhook_id, 'workspace': workspace, 'url': url,
+                                       'secret': secret, 'events': json.loads(events)}
+        self._by_workspace = self._index(self._hooks)
+        self._hooks_lock = threading.Lock()
+
+        # Backoff is per endpoint: webhook id -> (consecutive failures, next attempt time)
+        with self._db_lock:
+            failing = self._conn.execute(
+                '''SELECT webhook_id, MAX(attempts), MAX(next_attempt) FROM mandy_webhook_outbox
+                   WHERE next_attempt IS NOT NULL AND attempts > 0 GROUP BY webhook_id'''
+            ).fetchall()
+        self._backoff: Dict[str, tuple] = {webhook_id: (attempts, due) for webhook_id, attempts, due in failing}
+
+        self._pending = deque()
+        self._in_flight = set()
+        self._sessions = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mandy-webhook')
+        self._thread = threading.Thread(target=self._run, name='mandy-webhooks', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _index(hooks: Dict[str, Dict]) -> Dict[str, List[Dict]]:
+        by_workspace: Dict[str, List[Dict]] = {}
+        for hook in hooks.values():
+            by_workspace.setdefault(hook['workspace'], []).append(hook)
+        return by_workspace
+
+    @staticmethod
+    def _public(hook: Dict) -> Dict:
+        return {k: v for k, v in hook.items() if k != 'secret'}
+
+    def subscribe(self, workspace: str, url: str, events: Optional[List[str]] = None, secret: Optional[str] = None) -> Dict:
+        """Register an endpoint; the returned secret is only shown here"""
+        if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+            raise ValueError('Webhook URL must be http(s)')
+        if events is None:
+            events = list(DEFAULT_EVENTS)
+        if not isinstance(events, list) or not events or any(event not in DEFAULT_EVENTS for event in events):
+            raise ValueError(f"events must be a non-empty list of: {', '.join(DEFAULT_EVENTS)}")
+        if not self.allow_private:
+            check_url(url)
+        hook = {
+            'id': f'wh_{uuid.uuid4().hex[:12]}',
+            'workspace': workspace,
+            'url': url,
+            'secret': secret or secrets.token_hex(32),
+            'events': list(dict.fromkeys(events))
+        }
+        with self._db_lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO mandy_webhooks (id, workspace, url, secret, events, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (hook['id'], workspace, url, hook['secret'], json.dumps(hook['events']), time.time())
+            )
+        with self._hooks_lock:
+            hooks = dict(self._hooks, **{hook['id']: hook})
+            self._hooks, self._by_workspace = hooks, self._index(hooks)
+        return dict(hook)
+
+    def unsubscribe(self, workspace: str, webhook_id: str) -> bool:
+        """Remove an endpoint and anything still queued for it"""
+        hook = self._hooks.get(webhook_id)
+        if hook is None or hook['workspace'] != workspace:
+            return False
+        with self._hooks_lock:
+            hooks = {k: v for k, v in self._hooks.items() if k != webhook_id}
+            self._hooks, self._by_workspace = hooks, self._index(hooks)
+        self._backoff.pop(webhook_id, None)
+        with self._db_lock, self._conn:
+            self._conn.execute('DELETE FROM mandy_webhooks WHERE id = ?', (webhook_id,))
+            self._conn.execute('DELETE FROM mandy_webhook_outbox WHERE webhook_id = ?', (webhook_id,))
+        return True
+
+    def subscriptions(self, workspace: str) -> List[Dict]:
+        return [self._public(hook) for hook in self._by_workspace.get(workspace, ())]
+
+    def enqueue(self, workspace: str, event: str, data: Dict) -> bool:
+        """Queue an event for the workspace's endpoints; never blocks"""
+        if workspace not in self._by_workspace:
+            return False
+        self._pending.append((workspace, event, data))
+        return True
+
+    def pending(self) -> int:
+        """Events waiting to be delivered (dead ones excluded)"""
+        with self._db_lock:
+            stored = self._conn.execute('SELECT COUNT(*) FROM mandy_webhook_outbox WHERE next_attempt IS NOT NULL').fetchone()[0]
+        return stored + len(self._pending)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self._persist()
+                self._dispatch()
+            except Exception as e:
+                logger.error(f"Webhook dispatch failed: {e}")
+        self._persist()
+
+    def _persist(self):
+        """Write queued events to the outbox in one transaction"""
+        rows = []
+        now = time.time()
+        while self._pending:
+            workspace, event, data = self._pending.popleft()
+            payload = None
+            for hook in self._by_workspace.get(workspace, ()):
+                if event not in hook['events']:
+                    continue
+                if payload is None:
+                    payload = json.dumps({'id': f'evt_{uuid.uuid4().hex}', 'event': event, 'workspace': workspace, 'data': data})
+                rows.append((hook['id'], payload, now))
+        if rows:
+            with self._db_lock, self._conn:
+                self._conn.executemany(
+                    'INSERT INTO mandy_webhook_outbox (webhook_id, payload, next_attempt) VALUES (?, ?, ?)', rows
+                )
+            WEBHOOK_EVENTS.inc('queued', amount=len(rows))
+
+    def _dispatch(self):
+        now = time.time()
+        with self._db_lock:
+            due = self._conn.execute(
+                'SELECT DISTINCT webhook_id FROM mandy_webhook_outbox WHERE next_attempt <= ?', (now,)
+            ).fetchall()
+        for (webhook_id,) in due:
+            if webhook_id in self._in_flight:
+                continue
+            # A failing endpoint waits out its backoff, however many new events arrive
+            backoff = self._backoff.get(webhook_id)
+            if backoff is not None and backoff[1] > now:
+                continue
+            self._in_flight.add(webhook_id)
+            self._executor.submit(self._deliver, webhook_id)
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._sessions, 'session', None)
+        if session is None:
+            session = self._sessions.session = requests.Session()
+            # No proxies or .netrc from the environment: requests go straight to the checked address
+            session.trust_env = False
+            if not self.allow_private:
+                adapter = PublicOnlyAdapter()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+        return session
+
+    def _deliver(self, webhook_id: str):
+        """Send one batch to an endpoint, then delete it or schedule a retry"""
+        delivered = 0
+        try:
+            with self._db_lock:
+                rows = self._conn.execute(
+                    '''SELECT id, payload, attempts FROM mandy_webhook_outbox
+                       WHERE webhook_id = ? AND next_attempt <= ? ORDER BY id LIMIT ?''',
+                    (webhook_id, time.time(), self.batch_size)
+                ).fetchall()
+            hook = self._hooks.get(webhook_id)
+            if not rows or hook is None:
+                return
+            ids = [row[0] for row in rows]
+            body = ('{"events":[' + ','.join(row[1] for row in rows) + ']}').encode()
+            timestamp = str(int(time.time()))
+            retry_after = None
+            try:
+                response = self._session().post(hook['url'], data=body, timeout=self.timeout, allow_redirects=False, headers={
+                    'Content-Type': 'application/json',
+                    'User-Agent': 'MarketingMandy-Webhooks/1.0',
+                    'X-Mandy-Webhook': webhook_id,
+                    'X-Mandy-Timestamp': timestamp,
+                    'X-Mandy-Signature': f"sha256={sign(hook['secret'], timestamp, body)}"
+                })
+                ok = 200 <= response.status_code < 300
+                if not ok and response.headers.get('Retry-After', '').isdigit():
+                    retry_after = float(response.headers['Retry-After'])
+                error = None if ok else f'HTTP {response.status_code}'
+            except requests.RequestException as e:
+                ok, error = False, str(e)
+
+            if ok:
+                delivered = len(ids)
+                self._delete(ids)
+                self._backoff.pop(webhook_id, None)
+                WEBHOOK_EVENTS.inc('delivered', amount=delivered)
+            else:
+                self._retry(webhook_id, rows, retry_after)
+                logger.warning(f"Webhook {webhook_id} delivery failed ({error}); {len(ids)} events will be retried")
+        except Exception as e:
+            logger.error(f"Webhook {webhook_id} delivery error: {e}")
+        finally:
+            self._in_flight.discard(webhook_id)
+            if delivered == self.batch_size:
+                # Probably more waiting - don't sit out a flush interval
+                self._wake.set()
+
+    def _delete(self, ids: List[int]):
+        with self._db_lock, self._conn:
+            self._conn.execute(f"DELETE FROM mandy_webhook_outbox WHERE id IN ({','.join('?' * len(ids))})", ids)
+
+    def _retry(self, webhook_id: str, rows: List[tuple], retry_after: Optional[float]):
+        """Back the endpoint off and count the attempt against each event in the batch"""
+        failures = self._backoff.get(webhook_id, (0, 0))[0] + 1
+        # Jitter keeps a recovering endpoint from being hit by every batch at once
+        delay = min(self.max_backoff, 2 ** failures) * random.uniform(0.5, 1.0)
+        next_attempt = time.time() + max(delay, retry_after or 0)
+        self._backoff[webhook_id] = (failures, next_attempt)
+
+        dead = [row_id for row_id, _, attempts in rows if attempts + 1 >= self.max_attempts]
+        retried = [row_id for row_id, _, attempts in rows if attempts + 1 < self.max_attempts]
+        with self._db_lock, self._conn:
+            for ids, due in ((dead, None), (retried, next_attempt)):
+                if ids:
+                    self._conn.execute(
+                        f"UPDATE mandy_webhook_outbox SET attempts = attempts + 1, next_attempt = ? WHERE id IN ({','.join('?' * len(ids))})",
+                        [due, *ids]
+                    )
+        if dead:
+            WEBHOOK_EVENTS.inc('dead', amount=len(dead))
+        if retried:
+            WEBHOOK_EVENTS.inc('retried', amount=len(retried))
+
+    def flush(self):
+        """Persist queued events and start due deliveries now"""
+        self._wake.set()
+
+    def shutdown(self, wait: bool = True):
+        """Persist everything queued; undelivered events are sent after the next start"""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,158 @@
+"""
+Workspaces - Keeps each client's credentials, campaigns and jobs apart
+Every workspace has its own credentials vault under workspaces/<id>/, and its
+scheduled jobs go to one of a fixed number of shards picked by hashing the id.
+Each shard is a separate scheduler with its own SQLite job store, so thousands
+of workspaces spread their jobs over several schedulers and database files
+instead of queueing on one scheduler lock. The 'default' workspace keeps the
+original single-tenant files.
+
+Workspaces other than 'default' exist only once created, and are reached with
+the API token returned by create(); workspaces.json keeps just its SHA-256.
+"""
+import os
+import re
+import json
+import zlib
+import hashlib
+import secrets
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+DEFAULT_WORKSPACE = 'default'
+WORKSPACE_ID = re.compile(r'[a-z0-9][a-z0-9_-]{0,63}')
+
+
+def scoped(workspace_id: str, name: str) -> str:
+    """Key shared tables use for a workspace's account, e.g. acme/bluesky"""
+    return name if workspace_id == DEFAULT_WORKSPACE else f'{workspace_id}/{name}'
+
+
+def unscoped(key: str) -> Tuple[str, str]:
+    """Inverse of scoped(): (workspace id, name)"""
+    prefix, _, name = key.partition('/')
+    if name and WORKSPACE_ID.fullmatch(prefix):
+        return prefix, name
+    return DEFAULT_WORKSPACE, key
+
+
+class Workspace:
+    """One client's credentials, in-memory campaigns and job shard"""
+
+    def __init__(self, workspace_id: str, credentials_path: Path, shard: str):
+        self.id = workspace_id
+        self.credentials_path = credentials_path
+        self.shard = shard
+        # Campaign state; campaign_index keeps ids sorted (they start with the launch time)
+        self.campaigns: Dict[str, Dict] = {}
+        self.campaign_index = []
+        # Posting account per platform (as execute_post records it), resolved off the request path
+        self.account_keys: Dict[str, str] = {}
+        # Upload ledger for the quota: url -> bytes (files are shared, so each counts once)
+        self.uploads: Dict[str, int] = {}
+        self._credential_store = None
+
+    @property
+    def credential_store(self):
+        if self._credential_store is None:
+            from .credential_store import CredentialStore
+            self._credential_store = CredentialStore(self.credentials_path)
+        return self._credential_store
+
+    def scoped(self, name: str) -> str:
+        return scoped(self.id, name)
+
+
+class WorkspaceRouter:
+    """Maps workspace ids and API tokens to their files and job shard"""
+
+    def __init__(self, root: Path, shards: int = 8, default_credentials: Path = Path('./credentials.json')):
+        self.root = Path(root)
+        # Changing the shard count moves workspaces to other shards - pick it once
+        self.shards = shards
+        self.default_credentials = Path(default_credentials)
+        self.registry_path = self.root / 'workspaces.json'
+        self._workspaces: Dict[str, Workspace] = {}
+        self._lock = threading.Lock()
+        # Created workspaces: id -> {'token_sha256', 'created_at'}
+        self._registry: Dict[str, Dict] = self._read_registry()
+        self._by_token = {entry['token_sha256']: workspace_id for workspace_id, entry in self._registry.items()}
+
+    def _read_registry(self) -> Dict[str, Dict]:
+        try:
+            with open(self.registry_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_registry(self, registry: Dict[str, Dict]):
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.workspaces-', suffix='.tmp', dir=self.root)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(registry, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.registry_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _token_digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def create(self, workspace_id: str) -> str:
+        """Register a workspace and return its API token (only ever shown here)"""
+        if not WORKSPACE_ID.fullmatch(workspace_id or '') or workspace_id == DEFAULT_WORKSPACE:
+            raise ValueError(f'Invalid workspace id: {workspace_id!r}')
+        token = f'mandy_{secrets.token_urlsafe(32)}'
+        with self._lock:
+            if workspace_id in self._registry:
+                raise ValueError(f'Workspace {workspace_id} already exists')
+            entry = {'token_sha256': self._token_digest(token), 'created_at': datetime.now().isoformat()}
+            registry = dict(self._registry, **{workspace_id: entry})
+            self._write_registry(registry)
+            self._registry = registry
+            self._by_token[entry['token_sha256']] = workspace_id
+        return token
+
+    def authenticate(self, token: str) -> Optional[Workspace]:
+        """The workspace an API token belongs to, or None"""
+        workspace_id = self._by_token.get(self._token_digest(token))
+        return self.get(workspace_id) if workspace_id else None
+
+    def shard_for(self, workspace_id: str) -> str:
+        if workspace_id == DEFAULT_WORKSPACE:
+            return 'default'
+        return f'shard{zlib.crc32(workspace_id.encode()) % self.shards}'
+
+    def shard_urls(self) -> Dict[str, str]:
+        """SQLAlchemy job store URL per shard ('default' is configured by the app)"""
+        return {f'shard{n}': f"sqlite:///{self.root / f'jobs-{n:02d}.sqlite'}" for n in range(self.shards)}
+
+    def get(self, workspace_id: str) -> Workspace:
+        """The workspace with this id; raises ValueError unless it is 'default' or was created"""
+        workspace = self._workspaces.get(workspace_id)
+        if workspace is not None:
+            return workspace
+        if workspace_id != DEFAULT_WORKSPACE and workspace_id not in self._registry:
+            raise ValueError(f'Unknown workspace: {workspace_id!r}')
+
+        with self._lock:
+            workspace = self._workspaces.get(workspace_id)
+            if workspace is None:
+                if workspace_id == DEFAULT_WORKSPACE:
+                    credentials_path = self.default_credentials
+                else:
+                    credentials_path = self.root / workspace_id / 'credentials.json'
+                workspace = self._workspaces[workspace_id] = Workspace(
+                    workspace_id, credentials_path, self.shard_for(workspace_id)
+                )
+        return workspace
+
+    def __iter__(self):
+        return iter(list(self._workspaces.values()))